@@ -1,20 +1,42 @@
 # app.py
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 import os
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
+import json
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, get_jwt, verify_jwt_in_request
 from werkzeug.utils import secure_filename
-from pronunciation_assessment import pronunciation_assessment_configured_with_whisper
-from utils.helpers import allowed_file, setup_logging
+from pronunciation_assessment import pronunciation_assessment_configured_with_whisper, reference_cache, warm_reference_cache
+from utils.helpers import allowed_file, setup_logging, request_id_var
+from utils.model_loader import WhisperRuntime, MODEL_LOAD_MODES
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.api_keys import APIKeyVerifier, bump_api_key_revision, ensure_api_key_index, looks_like_jwt
+from utils.uploads import upload_source, unique_upload_path
+from utils.job_worker import requeue_stale_jobs, start_job_workers
+from utils.result_cache import ResultCache, hash_stream, model_version, scoring_config
+from utils.metrics import REGISTRY, LATENCY_BUCKETS, StageTimer
+from pronunciation_assessment import STAGE_SECONDS
+from utils.streaming import StreamingSession, StreamLimitExceeded, parse_control_message, parse_stream_options
+from utils.job_worker import queue_depth as job_queue_depth
 from config import Config
-import torch
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
 import logging
 from functools import wraps
 from flask_sqlalchemy import SQLAlchemy
-from models.api_key import db, APIKey
+from models.api_key import db, APIKey, APIKeyRevision, APIKeyUsage
+from models.job import AssessmentJob, JOB_DONE, JOB_FINISHED_STATUSES
+from models.result_cache import CachedResult  # Import để db.create_all() tạo bảng cache
 from flasgger import Swagger, swag_from
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 
 # Thiết lập logging
 setup_logging()
@@ -36,6 +58,16 @@ db.init_app(app)
 # Khởi tạo JWT Manager
 jwt = JWTManager(app)
 
+# Xác thực API key qua cache TTL, số lượt dùng được ghi xuống DB theo lô
+api_keys = APIKeyVerifier(
+    app,
+    ttl_seconds=app.config['API_KEY_CACHE_TTL_SECONDS'],
+    negative_ttl_seconds=app.config['API_KEY_NEGATIVE_CACHE_TTL_SECONDS'],
+    max_entries=app.config['API_KEY_CACHE_SIZE'],
+    flush_interval=app.config['API_KEY_USAGE_FLUSH_SECONDS'],
+    revision_check_seconds=app.config['API_KEY_REVISION_CHECK_SECONDS']
+)
+
 # Cấu hình Swagger với Security Definitions
 swagger_template = {
     "swagger": "2.0",
@@ -80,35 +112,215 @@ def add_bearer_to_auth_header():
     if auth_header and not auth_header.startswith("Bearer "):
         request.headers.environ["HTTP_AUTHORIZATION"] = f"Bearer {auth_header}"
 
+# Gắn mã request (nhận từ header X-Request-ID hoặc tự sinh) vào mọi dòng log của request
+@app.before_request
+def assign_request_id():
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    request.environ['request_id.token'] = request_id_var.set(request_id)
+
+@app.after_request
+def add_request_id_header(response):
+    response.headers['X-Request-ID'] = request_id_var.get()
+    return response
+
+@app.teardown_request
+def reset_request_id(exc):
+    token = request.environ.pop('request_id.token', None)
+    if token is not None:
+        request_id_var.reset(token)
+
 # Tạo thư mục uploads nếu chưa tồn tại
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
-# Tải mô hình và processor khi khởi động Flask
-logger.info("Loading Whisper model...")
-try:
-    processor = WhisperProcessor.from_pretrained(app.config['MODEL_DIR'])
-    model = WhisperForConditionalGeneration.from_pretrained(app.config['MODEL_DIR'])
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
-    logger.info("Whisper model loaded successfully.")
-except Exception as e:
-    logger.error(f"Error loading Whisper model: {e}")
-    raise e
+# Tạo thư mục lưu âm thanh của các job bất đồng bộ
+if not os.path.exists(app.config['JOB_AUDIO_FOLDER']):
+    os.makedirs(app.config['JOB_AUDIO_FOLDER'])
+
+# Whisper được nạp qua WhisperRuntime: import app không phải chờ nạp model (trừ chế độ 'eager')
+whisper = WhisperRuntime(
+    app.config['MODEL_DIR'],
+    backend=app.config['WHISPER_BACKEND'],
+    share_memory=app.config['MODEL_SHARE_MEMORY'],
+    batching_enabled=app.config['WHISPER_BATCHING_ENABLED'],
+    batch_max_size=app.config['WHISPER_BATCH_MAX_SIZE'],
+    batch_max_wait_ms=app.config['WHISPER_BATCH_MAX_WAIT_MS'],
+    warm_up_enabled=app.config['MODEL_WARMUP']
+)
+if app.config['MODEL_LOAD_MODE'] not in MODEL_LOAD_MODES:
+    raise ValueError(f"MODEL_LOAD_MODE phải là một trong {MODEL_LOAD_MODES}")
+if app.config['MODEL_LOAD_MODE'] == 'eager':
+    # Warm-up không chạy ở đây: với gunicorn preload, mỗi worker tự warm-up sau khi fork (xem gunicorn.conf.py)
+    whisper.load()
+elif app.config['MODEL_LOAD_MODE'] == 'background':
+    whisper.start_background()
+
+# Nạp trước cache phoneme cho ngân hàng câu mẫu (nếu được cấu hình)
+if app.config['PROMPT_BANK_FILE']:
+    try:
+        warm_reference_cache(app.config['PROMPT_BANK_FILE'])
+    except Exception as e:
+        logger.error(f"Error warming reference cache: {e}")
+
+# Cache kết quả theo nội dung âm thanh, reference_text, ngôn ngữ, phiên bản model và cấu hình chấm
+result_cache = None
+if app.config['RESULT_CACHE_ENABLED']:
+    result_cache = ResultCache(
+        model_version(app.config['MODEL_DIR'], app.config['WHISPER_BACKEND'], scoring_config(app.config)),
+        max_entries=app.config['RESULT_CACHE_MAX_ENTRIES'],
+        ttl_seconds=app.config['RESULT_CACHE_TTL_SECONDS'],
+        use_db=app.config['RESULT_CACHE_DB_ENABLED']
+    )
 
 # Tạo cơ sở dữ liệu nếu chưa tồn tại
 with app.app_context():
     db.create_all()
+    ensure_api_key_index()
+    # Bỏ các kết quả đã cache của model cũ (MODEL_DIR thay đổi) hoặc đã hết hạn
+    if result_cache is not None:
+        result_cache.purge_stale()
+
+# Metric của tầng HTTP (xuất tại /metrics)
+ASSESSMENTS_IN_FLIGHT = REGISTRY.gauge('assessment_requests_in_flight', 'Pronunciation assessments currently being processed.')
+ASSESSMENT_SECONDS = REGISTRY.histogram(
+    'assessment_request_seconds', 'End-to-end latency of the pronunciation assessment endpoint.', buckets=LATENCY_BUCKETS
+)
+HTTP_ERRORS = REGISTRY.counter('http_errors_total', 'HTTP responses with status >= 400.', labelnames=('endpoint', 'status'))
+
+if app.config['JOB_WORKERS'] > 0:
+    REGISTRY.gauge('assessment_job_queue_depth', 'Asynchronous assessment jobs waiting for a worker.', function=job_queue_depth)
+
+ASSESSMENTS_REJECTED = REGISTRY.counter(
+    'assessment_requests_rejected_total', 'Assessment requests rejected by admission control or rate limits.', labelnames=('reason',)
+)
+
+# Giới hạn số lượt suy luận chạy đồng thời (phần vượt quá chờ trong hàng đợi có giới hạn)
+admission = None
+if app.config['ADMISSION_ENABLED']:
+    admission = AdmissionController(
+        app.config['ADMISSION_MAX_CONCURRENT'],
+        app.config['ADMISSION_MAX_QUEUE'],
+        app.config['ADMISSION_QUEUE_TIMEOUT_SECONDS']
+    )
+    REGISTRY.gauge('assessment_admission_active', 'Assessments holding an inference slot.', function=admission.active)
+    REGISTRY.gauge('assessment_admission_waiting', 'Assessments waiting for an inference slot.', function=admission.waiting)
+
+def admission_slot(wait=True):
+    return admission.admit(wait=wait) if admission is not None else nullcontext()
+
+def bearer_credential():
+    """Chuỗi sau 'Bearer ' trong header Authorization (JWT hoặc API key), hoặc None."""
+    credential = request.headers.get('Authorization', '')
+    if credential.startswith('Bearer '):
+        credential = credential[len('Bearer '):]
+    return credential.strip() or None
+
+def rate_limit_key():
+    """Khóa giới hạn tần suất: JWT identity, nếu không có thì API key hợp lệ, cuối cùng là địa chỉ IP."""
+    credential = bearer_credential() or request.args.get('api_key')
+    if credential and not looks_like_jwt(credential):
+        verified = api_keys.verify(credential)
+        if verified is not None:
+            return f"apikey:{verified.id}"
+        return f"ip:{get_remote_address()}"
+
+    try:
+        # WebSocket gửi JWT qua query string
+        verify_jwt_in_request(optional=True, locations=['headers', 'query_string'])
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity:
+        return f"jwt:{identity}"
+    return f"ip:{get_remote_address()}"
+
+# Flask-Limiter đọc RATELIMIT_ENABLED, RATELIMIT_STORAGE_URI và RATELIMIT_HEADERS_ENABLED từ app.config
+limiter = Limiter(app=app, key_func=rate_limit_key)
+
+@app.errorhandler(429)
+def rate_limit_exceeded(e):
+    ASSESSMENTS_REJECTED.inc(reason='rate_limit')
+    logger.warning(f"Vượt giới hạn tần suất: {rate_limit_key()} trên {request.path}")
+    return jsonify({'msg': f'Rate limit exceeded: {e.description}'}), 429
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(e):
+    ASSESSMENTS_REJECTED.inc(reason=e.reason)
+    logger.warning(f"Từ chối request do quá tải ({e.reason}), Retry-After: {e.retry_after}s")
+    response = jsonify({'msg': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+@app.after_request
+def count_http_errors(response):
+    if response.status_code >= 400:
+        HTTP_ERRORS.inc(endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
+
+def instrument_assessment(func):
+    """Ghi nhận số request đang xử lý và độ trễ tổng của endpoint đánh giá phát âm."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        ASSESSMENTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            ASSESSMENT_SECONDS.observe(time.perf_counter() - start)
+            ASSESSMENTS_IN_FLIGHT.dec()
+    return wrapper
+
+def timings_requested():
+    """Client yêu cầu kèm khối 'timings' qua query ?timings=true hoặc trường form include_timings."""
+    value = request.args.get('timings') or request.form.get('include_timings') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+def lookup_cached_result(file, reference_text, language):
+    """Tính khóa cache từ nội dung tệp (trước khi giải mã). Trả về (cache_key, kết quả đã cache hoặc None)."""
+    if result_cache is None:
+        return None, None
+    cache_key = result_cache.key(hash_stream(file.stream), reference_text, language)
+    return cache_key, result_cache.get(cache_key)
+
+def store_cached_result(cache_key, results):
+    # Chỉ cache kết quả thành công, không cache thông báo lỗi
+    if cache_key is not None and 'PronunciationAssessment' in results:
+        result_cache.put(cache_key, results)
+
+def start_background_workers():
+    """Khôi phục các job bị gián đoạn và khởi động pool worker xử lý job bất đồng bộ."""
+    if app.config['JOB_WORKERS'] <= 0:
+        return []
+    with app.app_context():
+        requeue_stale_jobs()
+    return start_job_workers(app.config['JOB_WORKERS'], app.instance_path)
+
+def authenticate_api_key(credential):
+    """Xác thực API key: đặt g.api_key và ghi nhận lượt dùng. Trả về False nếu key không hợp lệ."""
+    verified = api_keys.verify(credential)
+    if verified is None:
+        logger.warning("Từ chối API key không hợp lệ hoặc đã bị vô hiệu hóa.")
+        return False
+    g.api_key = verified
+    api_keys.record_usage(verified)
+    return True
 
 # Decorator kiểm tra JWT và role
 def jwt_required_with_roles(required_roles=None):
     """
     Decorator yêu cầu JWT và kiểm tra roles nếu được chỉ định.
+    Endpoint không yêu cầu role cũng nhận API key đang hoạt động thay cho JWT.
     """
     def decorator(func):
         @wraps(func)
-        @jwt_required()
         def wrapper(*args, **kwargs):
+            credential = bearer_credential()
+            if not required_roles and credential and not looks_like_jwt(credential):
+                if not authenticate_api_key(credential):
+                    return jsonify({'msg': 'Invalid or inactive API key'}), 401
+                return func(*args, **kwargs)
+
+            verify_jwt_in_request()
             if required_roles:
                 claims = get_jwt()
                 user_role = claims.get('role', None)
@@ -119,6 +331,12 @@ def jwt_required_with_roles(required_roles=None):
         return wrapper
     return decorator
 
+def current_identity():
+    """Chủ thể của request: JWT identity, hoặc 'apikey:<owner>' khi xác thực bằng API key."""
+    if g.get('api_key') is not None:
+        return f"apikey:{g.api_key.owner}"
+    return get_jwt_identity()
+
 # Thêm handler cho lỗi 405 và 404
 @app.errorhandler(405)
 def method_not_allowed(e):
@@ -247,7 +465,9 @@ def create_api_key():
 
     new_key = APIKey(owner=owner)
     db.session.add(new_key)
+    bump_api_key_revision()
     db.session.commit()
+    api_keys.invalidate(new_key.key)
 
     logger.info(f"API key created for owner: {owner}")
     return jsonify({'api_key': new_key.key}), 201
@@ -316,11 +536,190 @@ def delete_api_key():
         return jsonify({'error': 'API key không tìm thấy hoặc đã bị vô hiệu hóa.'}), 404
 
     key.active = False
+    bump_api_key_revision()
     db.session.commit()
+    # Tiến trình này từ chối key ngay lập tức; các worker khác sau tối đa API_KEY_REVISION_CHECK_SECONDS
+    api_keys.invalidate(api_key)
 
     logger.info(f"API key deactivated: {api_key}")
     return jsonify({'message': 'API key đã được vô hiệu hóa.'}), 200
 
+# Endpoint xem trạng thái kiểm soát tải (chỉ dành cho admin)
+@app.route('/admin/admission-stats', methods=['GET'])
+@jwt_required_with_roles(required_roles=["ROLE_DEV"])
+@swag_from({
+    'tags': ['Admin'],
+    'security': [{'apiKey': []}],
+    'responses': {
+        200: {
+            'description': 'Số request đang chạy, đang chờ, đã nhận và đã từ chối theo lý do',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'enabled': {
+                        'type': 'boolean'
+                    }
+                }
+            }
+        },
+        403: {
+            'description': 'Forbidden: Insufficient permissions.'
+        }
+    }
+})
+def admission_stats():
+    """
+    Endpoint xem thống kê kiểm soát tải.
+    ---
+    """
+    if admission is None:
+        return jsonify({'enabled': False}), 200
+
+    stats = admission.stats()
+    stats['enabled'] = True
+    return jsonify(stats), 200
+
+# Endpoint xem thống kê gom batch của Whisper (chỉ dành cho admin)
+@app.route('/admin/batching-stats', methods=['GET'])
+@jwt_required_with_roles(required_roles=["ROLE_DEV"])
+@swag_from({
+    'tags': ['Admin'],
+    'security': [{'apiKey': []}],
+    'responses': {
+        200: {
+            'description': 'Histogram kích thước batch và thời gian chờ trong hàng đợi',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'enabled': {
+                        'type': 'boolean'
+                    }
+                }
+            }
+        },
+        403: {
+            'description': 'Forbidden: Insufficient permissions.'
+        }
+    }
+})
+def batching_stats():
+    """
+    Endpoint xem thống kê gom batch của Whisper.
+    ---
+    """
+    if whisper.batcher is None:
+        return jsonify({'enabled': False}), 200
+
+    stats = whisper.batcher.stats()
+    stats['enabled'] = True
+    return jsonify(stats), 200
+
+# Endpoint nạp trước cache phoneme từ tệp ngân hàng câu mẫu (chỉ dành cho admin)
+@app.route('/admin/warm-reference-cache', methods=['POST'])
+@jwt_required_with_roles(required_roles=["ROLE_DEV"])
+@swag_from({
+    'tags': ['Admin'],
+    'security': [{'apiKey': []}],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'path': {
+                        'type': 'string',
+                        'example': 'data/prompt_bank.txt'
+                    }
+                }
+            },
+            'description': 'Đường dẫn tệp ngân hàng câu mẫu (mặc định lấy từ PROMPT_BANK_FILE)'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Cache đã được nạp trước',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'loaded': {
+                        'type': 'integer'
+                    }
+                }
+            }
+        },
+        400: {
+            'description': 'Không có tệp ngân hàng câu mẫu'
+        },
+        403: {
+            'description': 'Forbidden: Insufficient permissions.'
+        }
+    }
+})
+def warm_reference_cache_endpoint():
+    """
+    Endpoint nạp trước cache phoneme cho reference_text.
+    ---
+    """
+    data = request.get_json(silent=True) or {}
+    path = data.get('path', None) or app.config['PROMPT_BANK_FILE']
+    if not path or not os.path.isfile(path):
+        logger.warning(f"Prompt bank file not found: {path}")
+        return jsonify({'error': 'Prompt bank file is required.'}), 400
+
+    loaded = warm_reference_cache(path)
+    return jsonify({'loaded': loaded, 'cache': reference_cache.stats()}), 200
+
+# Endpoint xem số lần hit/miss của cache phoneme (chỉ dành cho admin)
+@app.route('/admin/reference-cache-stats', methods=['GET'])
+@jwt_required_with_roles(required_roles=["ROLE_DEV"])
+@swag_from({
+    'tags': ['Admin'],
+    'security': [{'apiKey': []}],
+    'responses': {
+        200: {
+            'description': 'Kích thước cache và số lần hit/miss'
+        },
+        403: {
+            'description': 'Forbidden: Insufficient permissions.'
+        }
+    }
+})
+def reference_cache_stats():
+    """
+    Endpoint xem thống kê cache phoneme.
+    ---
+    """
+    return jsonify(reference_cache.stats()), 200
+
+# Endpoint xem thống kê cache kết quả đánh giá (chỉ dành cho admin)
+@app.route('/admin/result-cache-stats', methods=['GET'])
+@jwt_required_with_roles(required_roles=["ROLE_DEV"])
+@swag_from({
+    'tags': ['Admin'],
+    'security': [{'apiKey': []}],
+    'responses': {
+        200: {
+            'description': 'Kích thước, số lần hit/miss và phiên bản model của cache kết quả'
+        },
+        403: {
+            'description': 'Forbidden: Insufficient permissions.'
+        }
+    }
+})
+def result_cache_stats():
+    """
+    Endpoint xem thống kê cache kết quả đánh giá.
+    ---
+    """
+    if result_cache is None:
+        return jsonify({'enabled': False}), 200
+
+    stats = result_cache.stats()
+    stats['enabled'] = True
+    return jsonify(stats), 200
+
 # Endpoint kiểm tra logging
 @app.route('/test-logging', methods=['POST'])
 @jwt_required_with_roles()
@@ -384,8 +783,113 @@ def list_routes():
         output[url] = methods
     return jsonify(output), 200
 
+# Endpoint xuất metric theo định dạng Prometheus
+@app.route('/metrics', methods=['GET'])
+@swag_from({
+    'tags': ['Utility'],
+    'responses': {
+        200: {
+            'description': 'Metric theo định dạng văn bản của Prometheus (độ trễ từng bước, request đang xử lý, hàng đợi, lỗi)'
+        }
+    }
+})
+def metrics():
+    """
+    Endpoint xuất metric cho Prometheus.
+    ---
+    """
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# Liveness probe: tiến trình đang chạy và phục vụ HTTP (không phụ thuộc model)
+@app.route('/healthz', methods=['GET'])
+@swag_from({
+    'tags': ['Utility'],
+    'responses': {
+        200: {
+            'description': 'Ứng dụng đang chạy'
+        }
+    }
+})
+def healthz():
+    """
+    Endpoint kiểm tra tiến trình còn sống.
+    ---
+    """
+    return jsonify({'status': 'ok'}), 200
+
+# Readiness probe: chỉ trả 200 khi model đã nạp (và đã warm-up nếu bật MODEL_WARMUP)
+@app.route('/readyz', methods=['GET'])
+@swag_from({
+    'tags': ['Utility'],
+    'responses': {
+        200: {
+            'description': 'Model đã sẵn sàng phục vụ request'
+        },
+        503: {
+            'description': 'Model đang nạp, đang warm-up hoặc nạp thất bại'
+        }
+    }
+})
+def readyz():
+    """
+    Endpoint kiểm tra model đã sẵn sàng.
+    ---
+    """
+    if not whisper.ready:
+        # Ở chế độ 'lazy', lần kiểm tra đầu tiên kích hoạt việc nạp model trong nền
+        whisper.start_background()
+    status = whisper.status()
+    status['mode'] = app.config['MODEL_LOAD_MODE']
+    return jsonify(status), 200 if status['ready'] else 503
+
+# Kiểm tra tệp và tham số chung cho các endpoint đánh giá phát âm
+def parse_assessment_request():
+    """
+    Trả về (file, language, reference_text, error_response). error_response khác None khi yêu cầu không hợp lệ.
+    reference_text là danh sách khi client gửi reference_texts.
+    """
+    if 'file' not in request.files:
+        logger.warning("Không tìm thấy phần file trong yêu cầu.")
+        return None, None, None, (jsonify({'msg': 'No file part in the request'}), 422)
+
+    file = request.files['file']
+
+    if file.filename == '':
+        logger.warning("Không có tệp được chọn.")
+        return None, None, None, (jsonify({'msg': 'No selected file'}), 422)
+
+    if not allowed_file(file.filename):
+        logger.warning(f"Loại tệp không được phép: {file.filename}")
+        return None, None, None, (jsonify({'msg': f'File type not allowed. Allowed types: {app.config["ALLOWED_EXTENSIONS"]}'}), 422)
+
+    # Lấy các tham số khác
+    language = request.form.get('language', 'en-US')
+    reference_text = request.form.get('reference_text', None)
+
+    # Nhiều đáp án: lặp lại trường reference_texts, hoặc gửi một danh sách JSON
+    reference_texts = request.form.getlist('reference_texts')
+    if len(reference_texts) == 1 and reference_texts[0].lstrip().startswith('['):
+        try:
+            reference_texts = json.loads(reference_texts[0])
+        except ValueError:
+            return None, None, None, (jsonify({'msg': 'reference_texts must be a JSON list of strings'}), 422)
+    if reference_texts:
+        if not isinstance(reference_texts, list) or not all(isinstance(text, str) and text.strip() for text in reference_texts):
+            logger.warning("reference_texts không hợp lệ.")
+            return None, None, None, (jsonify({'msg': 'reference_texts must be a list of non-empty strings'}), 422)
+        if len(reference_texts) > app.config['MAX_REFERENCE_TEXTS']:
+            return None, None, None, (jsonify({'msg': f'At most {app.config["MAX_REFERENCE_TEXTS"]} reference_texts are allowed'}), 422)
+        reference_text = reference_texts
+
+    if not reference_text:
+        logger.warning("reference_text là bắt buộc.")
+        return None, None, None, (jsonify({'msg': 'reference_text is required'}), 422)
+
+    return file, language, reference_text, None
+
 # Endpoint đánh giá phát âm với JWT
 @app.route('/api/pronunciation-assessment', methods=['POST'])
+@limiter.limit(lambda: app.config['ASSESSMENT_RATE_LIMIT'])
 @jwt_required_with_roles()
 @swag_from({
     'tags': ['Pronunciation Assessment'],
@@ -411,8 +915,24 @@ def list_routes():
             'name': 'reference_text',
             'in': 'formData',
             'type': 'string',
-            'required': True,
-            'description': 'Văn bản tham khảo'
+            'required': False,
+            'description': 'Văn bản tham khảo (bắt buộc nếu không gửi reference_texts)'
+        },
+        {
+            'name': 'reference_texts',
+            'in': 'formData',
+            'type': 'array',
+            'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'required': False,
+            'description': 'Nhiều văn bản tham khảo (hoặc một danh sách JSON); kết quả chấm theo đáp án khớp nhất, kèm ReferenceScores'
+        },
+        {
+            'name': 'timings',
+            'in': 'query',
+            'type': 'boolean',
+            'required': False,
+            'description': 'Kèm thời gian xử lý của từng bước (giây) trong khối timings'
         }
     ],
     'responses': {
@@ -440,9 +960,16 @@ def list_routes():
         },
         403: {
             'description': 'Forbidden: Insufficient permissions.'
+        },
+        429: {
+            'description': 'Vượt giới hạn tần suất của JWT identity / API key; xem header Retry-After'
+        },
+        503: {
+            'description': 'Server quá tải hoặc model chưa sẵn sàng; xem header Retry-After'
         }
     }
 })
+@instrument_assessment
 def pronunciation_assessment():
     """
     Endpoint để đánh giá phát âm.
@@ -450,61 +977,335 @@ def pronunciation_assessment():
     """
     logger.info("Đã nhận yêu cầu đánh giá phát âm.")
 
-    if 'file' not in request.files:
-        logger.warning("Không tìm thấy phần file trong yêu cầu.")
-        return jsonify({'msg': 'No file part in the request'}), 422
-
-    file = request.files['file']
+    file, language, reference_text, error_response = parse_assessment_request()
+    if error_response is not None:
+        return error_response
 
-    if file.filename == '':
-        logger.warning("Không có tệp được chọn.")
-        return jsonify({'msg': 'No selected file'}), 422
-
-    if not allowed_file(file.filename):
-        logger.warning(f"Loại tệp không được phép: {file.filename}")
-        return jsonify({'msg': f'File type not allowed. Allowed types: {app.config["ALLOWED_EXTENSIONS"]}'}), 422
-
-    # Lưu tệp âm thanh
     filename = secure_filename(file.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(file_path)
-    logger.info(f"Tệp đã được lưu: {file_path}")
 
-    # Lấy các tham số khác
-    language = request.form.get('language', 'en-US')
-    reference_text = request.form.get('reference_text', None)
+    cache_key, cached = lookup_cached_result(file, reference_text, language)
+    if cached is not None:
+        logger.info(f"Trả kết quả đã cache cho tệp: {filename}")
+        return jsonify(cached), 200
 
-    if not reference_text:
-        logger.warning("reference_text là bắt buộc.")
-        return jsonify({'msg': 'reference_text is required'}), 422
+    # Nạp model nếu chưa có (chế độ 'lazy' hoặc thread nền chưa nạp xong)
+    try:
+        runtime = whisper.get()
+    except Exception as e:
+        logger.error(f"Model chưa sẵn sàng: {e}")
+        return jsonify({'msg': 'Model is not available'}), 503
 
     # Thực hiện đánh giá phát âm
+    timer = StageTimer(STAGE_SECONDS)
     try:
-        results = pronunciation_assessment_configured_with_whisper(
-            filename=file_path,
-            language=language,
-            reference_text=reference_text,
-            processor=processor,
-            model=model,
-            device=device
-        )
-        logger.info(f"Đánh giá phát âm hoàn thành cho tệp: {filename}")
+        # Chờ slot suy luận (hoặc bị từ chối nhanh với 503 + Retry-After khi quá tải)
+        with admission_slot(), upload_source(
+            file,
+            mode=app.config['UPLOAD_MODE'],
+            upload_folder=app.config['UPLOAD_FOLDER'],
+            spool_max_size=app.config['UPLOAD_SPOOL_MAX_SIZE']
+        ) as audio_source:
+            results = pronunciation_assessment_configured_with_whisper(
+                filename=audio_source,
+                language=language,
+                reference_text=reference_text,
+                processor=runtime.processor,
+                model=runtime.model,
+                device=runtime.device,
+                batcher=runtime.batcher,
+                timer=timer
+            )
+        logger.info(f"Đánh giá phát âm hoàn thành cho tệp: {filename}", extra={'timings': timer.timings})
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Lỗi trong quá trình đánh giá: {e}")
         return jsonify({'msg': str(e)}), 500
-    finally:
-        # Xóa tệp sau khi xử lý (tuỳ chọn)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Tệp đã bị xóa: {file_path}")
 
+    store_cached_result(cache_key, results)
+    if timings_requested():
+        results = dict(results, timings=timer.timings)
     return jsonify(results), 200
 
+# Endpoint tạo job đánh giá phát âm bất đồng bộ
+@app.route('/api/pronunciation-assessment/jobs', methods=['POST'])
+@limiter.limit(lambda: app.config['ASSESSMENT_RATE_LIMIT'])
+@jwt_required_with_roles()
+@swag_from({
+    'tags': ['Pronunciation Assessment'],
+    'security': [{'apiKey': []}],
+    'consumes': ['multipart/form-data'],
+    'parameters': [
+        {
+            'name': 'file',
+            'in': 'formData',
+            'type': 'file',
+            'required': True,
+            'description': 'Tệp âm thanh cần đánh giá'
+        },
+        {
+            'name': 'language',
+            'in': 'formData',
+            'type': 'string',
+            'required': False,
+            'default': 'en-US',
+            'description': 'Ngôn ngữ của tệp âm thanh'
+        },
+        {
+            'name': 'reference_text',
+            'in': 'formData',
+            'type': 'string',
+            'required': False,
+            'description': 'Văn bản tham khảo (bắt buộc nếu không gửi reference_texts)'
+        },
+        {
+            'name': 'reference_texts',
+            'in': 'formData',
+            'type': 'array',
+            'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'required': False,
+            'description': 'Nhiều văn bản tham khảo (hoặc một danh sách JSON); kết quả chấm theo đáp án khớp nhất, kèm ReferenceScores'
+        }
+    ],
+    'responses': {
+        202: {
+            'description': 'Job đã được đưa vào hàng đợi',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'job_id': {
+                        'type': 'string'
+                    },
+                    'status': {
+                        'type': 'string'
+                    }
+                }
+            }
+        },
+        422: {
+            'description': 'Lỗi yêu cầu, không có tệp hoặc tham số yêu cầu'
+        },
+        429: {
+            'description': 'Vượt giới hạn tần suất của JWT identity / API key; xem header Retry-After'
+        },
+        503: {
+            'description': 'Không có worker xử lý job'
+        },
+        403: {
+            'description': 'Forbidden: Insufficient permissions.'
+        }
+    }
+})
+def create_assessment_job():
+    """
+    Endpoint tạo job đánh giá phát âm bất đồng bộ.
+    ---
+    """
+    if app.config['JOB_WORKERS'] <= 0:
+        return jsonify({'msg': 'Asynchronous jobs are disabled'}), 503
+
+    file, language, reference_text, error_response = parse_assessment_request()
+    if error_response is not None:
+        return error_response
+
+    # Bài nộp trùng với kết quả đã có: tạo job hoàn thành ngay, không cần worker
+    _, cached = lookup_cached_result(file, reference_text, language)
+    if cached is not None:
+        # Cột DateTime của AssessmentJob lưu giờ UTC không kèm múi giờ
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        job = AssessmentJob(
+            owner=current_identity(),
+            status=JOB_DONE,
+            audio_path='',
+            language=language,
+            reference_text=AssessmentJob.encode_reference(reference_text),
+            result=json.dumps(cached),
+            started_at=now,
+            finished_at=now
+        )
+        db.session.add(job)
+        db.session.commit()
+        return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+    # Job phải tồn tại qua lần khởi động lại, nên âm thanh được lưu xuống đĩa
+    audio_path = unique_upload_path(app.config['JOB_AUDIO_FOLDER'], file.filename)
+    file.save(audio_path)
+
+    job = AssessmentJob(
+        owner=current_identity(),
+        audio_path=audio_path,
+        language=language,
+        reference_text=AssessmentJob.encode_reference(reference_text)
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    logger.info(f"Assessment job queued: {job.id}")
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+# Endpoint xem trạng thái và kết quả job (hỗ trợ long-polling qua tham số wait)
+@app.route('/api/pronunciation-assessment/jobs/<job_id>', methods=['GET'])
+@jwt_required_with_roles()
+@swag_from({
+    'tags': ['Pronunciation Assessment'],
+    'security': [{'apiKey': []}],
+    'parameters': [
+        {
+            'name': 'job_id',
+            'in': 'path',
+            'type': 'string',
+            'required': True,
+            'description': 'ID của job'
+        },
+        {
+            'name': 'wait',
+            'in': 'query',
+            'type': 'number',
+            'required': False,
+            'description': 'Số giây tối đa chờ job hoàn thành (long-polling)'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Trạng thái và kết quả của job'
+        },
+        404: {
+            'description': 'Job không tồn tại'
+        },
+        403: {
+            'description': 'Forbidden: Insufficient permissions.'
+        }
+    }
+})
+def get_assessment_job(job_id):
+    """
+    Endpoint xem trạng thái và kết quả job đánh giá phát âm.
+    ---
+    """
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'msg': 'wait must be a number'}), 422
+    deadline = time.monotonic() + min(max(wait, 0.0), app.config['JOB_MAX_WAIT_SECONDS'])
+
+    while True:
+        job = AssessmentJob.query.filter_by(id=job_id, owner=current_identity()).first()
+        if not job:
+            return jsonify({'msg': 'Job not found'}), 404
+        if job.status in JOB_FINISHED_STATUSES or time.monotonic() >= deadline:
+            return jsonify(job.to_dict()), 200
+        # Kết thúc transaction hiện tại để lần truy vấn sau đọc được trạng thái mới
+        db.session.rollback()
+        time.sleep(app.config['JOB_POLL_INTERVAL'])
+
+# Endpoint đánh giá phát âm theo thời gian thực qua WebSocket (cần flask-sock)
+#
+# Giao thức:
+#   1. Kết nối tới /ws/pronunciation-assessment?jwt=<token> hoặc ?api_key=<key> (hoặc gửi header Authorization).
+#   2. Gửi tin nhắn văn bản JSON: {"reference_text": "...", "language": "en-US", "sample_rate": 16000}
+#   3. Gửi các khối nhị phân PCM 16-bit little-endian, mono. Server trả {"event": "partial", ...}
+#      với transcription, WER và AccuracyScore tạm thời.
+#   4. Gửi {"event": "end"}; server trả {"event": "final", "result": {...}} (giống REST endpoint) rồi đóng.
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route('/ws/pronunciation-assessment')
+    @limiter.limit(lambda: app.config['ASSESSMENT_RATE_LIMIT'])
+    def pronunciation_assessment_stream(ws):
+        # Trình duyệt không gửi được header khi mở WebSocket nên credential cũng được nhận qua query string
+        credential = bearer_credential() or request.args.get('api_key')
+        try:
+            if credential and not looks_like_jwt(credential):
+                if not authenticate_api_key(credential):
+                    raise PermissionError('Invalid or inactive API key')
+            else:
+                verify_jwt_in_request(locations=['headers', 'query_string'])
+        except Exception as e:
+            logger.warning(f"Từ chối kết nối WebSocket: {e}")
+            ws.send(json.dumps({'event': 'error', 'msg': 'Unauthorized'}))
+            ws.close()
+            return
+
+        try:
+            runtime = whisper.get()
+        except Exception as e:
+            logger.error(f"Model chưa sẵn sàng: {e}")
+            ws.send(json.dumps({'event': 'error', 'msg': 'Model is not available'}))
+            ws.close()
+            return
+
+        try:
+            reference_text, language, sample_rate = parse_stream_options(ws.receive())
+        except ValueError as e:
+            logger.warning(f"Tin nhắn đầu tiên của phiên WebSocket không hợp lệ: {e}")
+            ws.send(json.dumps({'event': 'error', 'msg': str(e)}))
+            ws.close()
+            return
+
+        try:
+            session = StreamingSession(
+                reference_text=reference_text,
+                language=language,
+                processor=runtime.processor,
+                model=runtime.model,
+                device=runtime.device,
+                batcher=runtime.batcher,
+                sample_rate=sample_rate,
+                max_seconds=app.config['STREAM_MAX_SECONDS'],
+                window_seconds=app.config['STREAM_WINDOW_SECONDS'],
+                partial_interval_seconds=app.config['STREAM_PARTIAL_INTERVAL_SECONDS'],
+                admission=admission_slot
+            )
+        except Exception as e:
+            logger.error(f"Không tạo được phiên WebSocket: {e}")
+            ws.send(json.dumps({'event': 'error', 'msg': 'Could not start the assessment session'}))
+            ws.close()
+            return
+
+        logger.info("Bắt đầu phiên đánh giá phát âm qua WebSocket.")
+        try:
+            while True:
+                message = ws.receive()
+                if isinstance(message, (bytes, bytearray)):
+                    try:
+                        partial = session.add_audio(message)
+                    except AdmissionRejected as e:
+                        # Quá tải: bỏ qua kết quả tạm thời này, âm thanh vẫn được giữ cho kết quả cuối
+                        ASSESSMENTS_REJECTED.inc(reason=e.reason)
+                        continue
+                    if partial is not None:
+                        ws.send(json.dumps(partial))
+                    continue
+                try:
+                    event = parse_control_message(message)
+                except ValueError as e:
+                    ws.send(json.dumps({'event': 'error', 'msg': str(e)}))
+                    break
+                if event == 'end':
+                    ws.send(json.dumps(session.final_result()))
+                    break
+        except AdmissionRejected as e:
+            ASSESSMENTS_REJECTED.inc(reason=e.reason)
+            logger.warning(f"Từ chối kết quả cuối của phiên WebSocket do quá tải ({e.reason}).")
+            ws.send(json.dumps({'event': 'error', 'msg': str(e), 'retry_after': e.retry_after}))
+        except StreamLimitExceeded as e:
+            ws.send(json.dumps({'event': 'error', 'msg': str(e)}))
+        except Exception as e:
+            logger.error(f"Lỗi trong phiên WebSocket: {e}")
+            ws.send(json.dumps({'event': 'error', 'msg': str(e)}))
+        finally:
+            ws.close()
+
 # Endpoint chính
 @app.route('/')
 def index():
     return "API Flask cho Đánh Giá Phát Âm đang chạy."
 
 if __name__ == '__main__':
+    # Với reloader của chế độ debug, chỉ tiến trình con (đang phục vụ request) mới khởi động worker
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
+
     # Chạy Flask app
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,246 @@
+# batch_assess.py
+"""
+Chấm hàng loạt (offline) từ một manifest CSV/JSONL, không cần gửi request HTTP.
+
+Mỗi dòng manifest gồm: audio_path (hoặc file), reference_text, language (tùy chọn) và id
+(hoặc request_id; mặc định là audio_path). Đường dẫn tương đối được tính từ thư mục của manifest.
+
+    python batch_assess.py manifest.jsonl --output results.jsonl --workers 2 --batch-size 8
+
+Kết quả được ghi dần ra tệp JSONL (mỗi dòng một bài). Chạy lại cùng lệnh sau khi bị dừng sẽ bỏ qua
+các id đã có trong tệp kết quả (dùng --retry-errors để chấm lại các bài bị lỗi).
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from config import Config
+from utils.helpers import setup_logging
+
+logger = logging.getLogger('batch_assess')
+
+# Trạng thái của mỗi tiến trình worker (khởi tạo một lần trong _init_worker)
+_worker = {}
+
+
+def _manifest_rows(f, path):
+    if path.lower().endswith('.csv'):
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_manifest(path):
+    """Đọc manifest CSV hoặc JSONL từng dòng, trả về (generator) các dict đã chuẩn hóa khóa."""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        for index, row in enumerate(_manifest_rows(f, path)):
+            audio_path = row.get('audio_path') or row.get('file')
+            if not audio_path or not row.get('reference_text'):
+                logger.warning(f"Skipping manifest row {index}: audio_path and reference_text are required")
+                continue
+            if not os.path.isabs(audio_path):
+                audio_path = os.path.join(base_dir, audio_path)
+            yield {
+                'id': str(row.get('id') or row.get('request_id') or audio_path),
+                'audio_path': audio_path,
+                'reference_text': row['reference_text'],
+                'language': row.get('language') or 'en-US'
+            }
+
+
+def read_manifest(path):
+    """Toàn bộ manifest dưới dạng danh sách (cho manifest nhỏ, ví dụ benchmarks/load_replay.py)."""
+    return list(iter_manifest(path))
+
+
+def iter_groups(items, batch_size):
+    """Chia một iterable thành các nhóm `batch_size` phần tử mà không đọc trước toàn bộ."""
+    iterator = iter(items)
+    while True:
+        group = list(itertools.islice(iterator, batch_size))
+        if not group:
+            return
+        yield group
+
+
+def read_completed_ids(output_path, retry_errors=False):
+    """Các id đã có kết quả trong tệp output (để tiếp tục sau khi bị dừng)."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Dòng cuối có thể bị ghi dở khi tiến trình bị dừng đột ngột
+                continue
+            if retry_errors and record.get('status') != 'ok':
+                continue
+            completed.add(record['id'])
+    return completed
+
+
+def discard_partial_line(output_path, chunk_size=65536):
+    """
+    Cắt bỏ dòng cuối ghi dở (không kết thúc bằng '\n') trước khi ghi nối tiếp, nếu không record mới
+    sẽ dính vào dòng đó và bị bỏ qua ở mọi lần tiếp tục sau. Trả về số byte đã cắt.
+    """
+    if not os.path.exists(output_path):
+        return 0
+    with open(output_path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - chunk_size)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+        return size - end
+
+
+def _init_worker(batch_size, batch_wait_ms):
+    from pronunciation_assessment import load_whisper_model
+    from utils.batching import WhisperBatcher
+
+    setup_logging()
+    processor, model, device = load_whisper_model(Config.MODEL_DIR)
+    _worker['processor'] = processor
+    _worker['model'] = model
+    _worker['device'] = device
+    # Các bài trong cùng một nhóm chạy song song bằng thread, nên generate được gom thành batch
+    _worker['batcher'] = WhisperBatcher(processor, model, device, max_batch_size=batch_size, max_wait_ms=batch_wait_ms)
+    _worker['threads'] = ThreadPoolExecutor(max_workers=batch_size)
+
+
+def _assess_item(item):
+    from pronunciation_assessment import pronunciation_assessment_configured_with_whisper
+    from utils.metrics import StageTimer
+
+    timer = StageTimer()
+    try:
+        results = pronunciation_assessment_configured_with_whisper(
+            filename=item['audio_path'],
+            language=item['language'],
+            reference_text=item['reference_text'],
+            processor=_worker['processor'],
+            model=_worker['model'],
+            device=_worker['device'],
+            batcher=_worker['batcher'],
+            timer=timer
+        )
+    except Exception as e:
+        results = {'msg': str(e)}
+
+    record = {'id': item['id'], 'audio_path': item['audio_path'], 'timings': timer.timings}
+    if 'PronunciationAssessment' in results:
+        record.update(status='ok', result=results)
+    else:
+        record.update(status='error', error=results.get('msg', 'Unknown error'))
+    return record
+
+
+def _assess_group(items):
+    return list(_worker['threads'].map(_assess_item, items))
+
+
+def run(items, output_path, workers, batch_size, batch_wait_ms, progress_every):
+    """`items` có thể là generator: manifest được đọc dần theo tốc độ xử lý, không nạp hết vào bộ nhớ."""
+    groups = iter_groups(items, batch_size)
+    done = errors = 0
+    start = time.monotonic()
+    last_report = 0
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(batch_size, batch_wait_ms)) as pool, \
+            open(output_path, 'a', encoding='utf-8') as output:
+        pending = set()
+        exhausted = False
+        # Giới hạn số nhóm đang chờ để bộ nhớ không tăng theo kích thước manifest
+        max_pending = workers * 2
+
+        while not exhausted or pending:
+            while not exhausted and len(pending) < max_pending:
+                group = next(groups, None)
+                if group is None:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_assess_group, group))
+            if not pending:
+                break
+
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                for record in future.result():
+                    output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    done += 1
+                    errors += record['status'] != 'ok'
+                output.flush()
+
+            if done - last_report >= progress_every or not pending:
+                last_report = done
+                elapsed = time.monotonic() - start
+                rate = done / elapsed if elapsed > 0 else 0.0
+                logger.info(f"Progress: {done} done ({errors} errors), {rate:.2f} items/s")
+
+    elapsed = time.monotonic() - start
+    return done, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chấm phát âm hàng loạt từ manifest CSV/JSONL.')
+    parser.add_argument('manifest', help='Tệp manifest (.csv hoặc .jsonl)')
+    parser.add_argument('--output', required=True, help='Tệp JSONL kết quả (được ghi nối tiếp)')
+    parser.add_argument('--workers', type=int, default=max(1, multiprocessing.cpu_count() // 4),
+                        help='Số tiến trình worker, mỗi tiến trình tải Whisper một lần')
+    parser.add_argument('--batch-size', type=int, default=Config.WHISPER_BATCH_MAX_SIZE,
+                        help='Số bài chạy song song trong mỗi worker (kích thước batch của Whisper)')
+    parser.add_argument('--batch-wait-ms', type=float, default=Config.WHISPER_BATCH_MAX_WAIT_MS)
+    parser.add_argument('--retry-errors', action='store_true', help='Chấm lại các bài bị lỗi ở lần chạy trước')
+    parser.add_argument('--progress-every', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_logging()
+    truncated = discard_partial_line(args.output)
+    if truncated:
+        logger.warning(f"Discarded a partially written last line ({truncated} bytes) from {args.output}")
+    completed = read_completed_ids(args.output, retry_errors=args.retry_errors)
+    logger.info(f"{len(completed)} items already done in {args.output}")
+
+    # Manifest được đọc dần; các id đã xong được lọc trong lúc đọc
+    skipped = [0]
+
+    def remaining():
+        for item in iter_manifest(args.manifest):
+            if item['id'] in completed:
+                skipped[0] += 1
+                continue
+            yield item
+
+    done, errors, elapsed = run(remaining(), args.output, args.workers, args.batch_size,
+                                args.batch_wait_ms, args.progress_every)
+    rate = done / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Finished {done} items ({errors} errors, {skipped[0]} skipped as already done) "
+                f"in {elapsed:.1f}s, {rate:.2f} items/s")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
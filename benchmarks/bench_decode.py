@@ -0,0 +1,79 @@
+# benchmarks/bench_decode.py
+"""
+So sánh thời gian giải mã âm thanh cho mỗi request:
+  - before: librosa.load hai lần (Whisper + analyze_intonation như trước đây)
+  - after:  decode_audio một lần, buffer dùng chung cho mọi bước
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_decode
+    python -m benchmarks.bench_decode --files sample1.mp3 sample2.m4a --repeat 10
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from pronunciation_assessment import SAMPLING_RATE, decode_audio
+
+
+def make_synthetic_wav(directory, seconds, source_rate=44100):
+    """Tạo tệp WAV tổng hợp (44.1 kHz, stereo) để bước resample có chi phí thật."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * source_rate)) / source_rate
+    tone = 0.3 * np.sin(2 * np.pi * 180 * t) + 0.01 * rng.standard_normal(t.shape)
+    stereo = np.stack([tone, tone], axis=1).astype(np.float32)
+    path = os.path.join(directory, f'synthetic_{seconds}s.wav')
+    sf.write(path, stereo, source_rate)
+    return path
+
+
+def decode_before(path):
+    y, sr = librosa.load(path, sr=SAMPLING_RATE)
+    y_again, _ = librosa.load(path, sr=SAMPLING_RATE)
+    return y
+
+
+def decode_after(path):
+    y, _ = decode_audio(path, SAMPLING_RATE)
+    return y
+
+
+def time_call(func, path, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(path)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark giải mã âm thanh trước/sau khi dùng buffer chung.')
+    parser.add_argument('--files', nargs='*', default=None, help='Các tệp âm thanh thật cần đo')
+    parser.add_argument('--durations', nargs='*', type=float, default=[5, 30, 120],
+                        help='Độ dài (giây) của các tệp tổng hợp khi không chỉ định --files')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.files or [make_synthetic_wav(tmp, d) for d in args.durations]
+
+        # Lần chạy đầu tiên bị ảnh hưởng bởi JIT/khởi tạo thư viện, nên chạy nháp trước
+        decode_after(files[0])
+
+        print(f"{'file':<40} {'before (s)':>12} {'after (s)':>12} {'speedup':>9}")
+        for path in files:
+            before = time_call(decode_before, path, args.repeat)
+            after = time_call(decode_after, path, args.repeat)
+            speedup = before / after if after > 0 else float('inf')
+            print(f"{os.path.basename(path):<40} {before:>12.4f} {after:>12.4f} {speedup:>8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/bench_edit_distance.py
+"""
+So sánh khoảng cách chỉnh sửa phoneme: nltk.edit_distance (vòng lặp Python thuần, chỉ trả về số)
+với utils.alignment (NumPy theo từng hàng, có cả căn chỉnh).
+
+    python -m benchmarks.bench_edit_distance --lengths 50 200 1000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import nltk
+
+from utils.alignment import align, edit_distance
+
+# Tập phoneme ARPAbet (có dấu trọng âm) giống đầu ra của g2p_en
+PHONEMES = [
+    'AA1', 'AE1', 'AH0', 'AH1', 'AO1', 'AW1', 'AY1', 'B', 'CH', 'D', 'DH', 'EH1', 'ER0', 'EY1', 'F', 'G',
+    'HH', 'IH0', 'IH1', 'IY1', 'JH', 'K', 'L', 'M', 'N', 'NG', 'OW1', 'OY1', 'P', 'R', 'S', 'SH', 'T',
+    'TH', 'UH1', 'UW1', 'V', 'W', 'Y', 'Z', 'ZH'
+]
+
+
+def make_pair(length, error_rate, rng):
+    reference = [rng.choice(PHONEMES) for _ in range(length)]
+    hypothesis = []
+    for p in reference:
+        r = rng.random()
+        if r < error_rate / 3:
+            continue
+        if r < 2 * error_rate / 3:
+            hypothesis.append(rng.choice(PHONEMES))
+        elif r < error_rate:
+            hypothesis.extend([p, rng.choice(PHONEMES)])
+        else:
+            hypothesis.append(p)
+    return reference, hypothesis
+
+
+def time_call(func, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark khoảng cách chỉnh sửa phoneme.')
+    parser.add_argument('--lengths', nargs='*', type=int, default=[20, 50, 200, 1000])
+    parser.add_argument('--error-rate', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'length':>7} {'nltk (ms)':>10} {'numpy (ms)':>11} {'align (ms)':>11} {'speedup':>8}")
+    for length in args.lengths:
+        reference, hypothesis = make_pair(length, args.error_rate, rng)
+        nltk_time, nltk_distance = time_call(lambda: nltk.edit_distance(hypothesis, reference), args.repeat)
+        numpy_time, numpy_distance = time_call(lambda: edit_distance(reference, hypothesis), args.repeat)
+        align_time, alignment = time_call(lambda: align(reference, hypothesis), args.repeat)
+        assert nltk_distance == numpy_distance == alignment.distance
+        print(f"{length:>7} {nltk_time * 1000:>10.2f} {numpy_time * 1000:>11.2f} {align_time * 1000:>11.2f} "
+              f"{nltk_time / numpy_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_gramformer.py
+"""
+Thông lượng (câu/giây) của Gramformer: correct từng câu so với correct_batch (beam và greedy).
+
+    python -m benchmarks.bench_gramformer --sentences 64 --batch-size 16
+"""
+
+import argparse
+import time
+
+from gramformer import Gramformer
+
+SENTENCES = [
+    "he are moving here",
+    "i am doing fine how is you",
+    "how is they",
+    "matt like fish",
+    "the collection of letters was original used by the ancient romans",
+    "we enjoys horror movies",
+    "anna and mike is going skiing",
+    "i walk to the store and i bought milk",
+    "we all eat the fish and then made dessert",
+    "i will eat fish for dinner and drank milk",
+    "what be the reason for everyone leave the company"
+]
+
+
+def make_sentences(count):
+    return [SENTENCES[i % len(SENTENCES)] for i in range(count)]
+
+
+def measure(name, func, sentences):
+    start = time.perf_counter()
+    func(sentences)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<32} {elapsed:>9.2f}s {len(sentences) / elapsed:>10.2f} sentences/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark thông lượng Gramformer.')
+    parser.add_argument('--sentences', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--use-gpu', action='store_true')
+    args = parser.parse_args()
+
+    gf = Gramformer(models=1, use_gpu=args.use_gpu)
+    sentences = make_sentences(args.sentences)
+
+    # Chạy nháp để loại bỏ chi phí khởi tạo lần đầu
+    gf.correct_batch(sentences[:2], num_beams=1, do_sample=False)
+
+    print(f"{'mode':<32} {'time':>10} {'throughput':>21}")
+    measure('correct (loop, beam=7, sample)', lambda s: [gf.correct(x) for x in s], sentences)
+    measure('correct_batch (beam=7, sample)',
+            lambda s: gf.correct_batch(s, num_beams=7, do_sample=True, batch_size=args.batch_size), sentences)
+    measure('correct_batch (beam=4)',
+            lambda s: gf.correct_batch(s, num_beams=4, do_sample=False, batch_size=args.batch_size), sentences)
+    measure('correct_batch (greedy)',
+            lambda s: gf.correct_batch(s, num_beams=1, do_sample=False, batch_size=args.batch_size), sentences)
+
+
+if __name__ == '__main__':
+    main()
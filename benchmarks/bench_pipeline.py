@@ -0,0 +1,311 @@
+# benchmarks/bench_pipeline.py
+"""
+Đo thời gian từng bước của pipeline đánh giá phát âm trên dữ liệu tổng hợp cố định (5 s, 30 s, 120 s).
+
+Âm thanh (WAV 44.1 kHz, để bước giải mã có resample) và văn bản được sinh offline từ seed cố định,
+nên hai lần chạy trên cùng máy đo trên đúng cùng dữ liệu. Các bước được đo riêng:
+decode, vad, feature_extraction, generate (Whisper), g2p, per, wer_cer, intonation,
+grammar_textblob, grammar (backend trong Config), lexical_diversity, gramformer_correct, gramformer_highlight.
+
+Kết quả (median/min/max theo giây) được ghi ra JSON. Truyền --baseline để so sánh với một lần chạy
+trước: bước nào có median chậm hơn quá --threshold (và quá --min-delta-ms) bị coi là hồi quy,
+script trả về mã thoát 1.
+
+    python -m benchmarks.bench_pipeline --output bench_before.json
+    python -m benchmarks.bench_pipeline --output bench_after.json --baseline bench_before.json
+    python -m benchmarks.bench_pipeline --durations 5 --skip whisper gramformer
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import soundfile as sf
+
+from config import Config
+from pronunciation_assessment import (
+    SAMPLING_RATE, analyze_intonation, calculate_per, calculate_wer_cer, decode_audio, find_speech_region,
+    get_grammar_errors_and_grammar_scores, lexical_diversity, load_whisper_model, preprocess_text,
+    reference_cache, get_reference_entry, text_to_phonemes, transcribe_features, transcribe_long_audio
+)
+from utils.alignment import align
+from utils.grammar import clear_grammar_caches
+from utils.metrics import StageTimer
+from utils.segmentation import WHISPER_MAX_SECONDS
+
+FIXTURE_SAMPLE_RATE = 44100
+WORDS_PER_SECOND = 2.5
+SEED = 20240601
+
+VOCABULARY = (
+    "the a an this that my your our their people time year day way thing world life hand part child eye "
+    "woman place work week case point government company number group problem fact be have do say get make "
+    "go know take see come think look want give use find tell ask seem feel try leave call good new first "
+    "last long great little own other old right big high different small large next early young important "
+    "few public bad same able to of in for on with at by from up about into over after because when while "
+    "and but or so if then usually often always never sometimes really very quite we you they he she it"
+).split()
+
+# Nhóm bước có thể bỏ qua bằng --skip
+STAGE_GROUPS = {
+    'whisper': ('feature_extraction', 'generate'),
+    'gramformer': ('gramformer_correct', 'gramformer_highlight'),
+    'textblob': ('grammar_textblob',)
+}
+
+
+def make_text(duration, seed):
+    """Văn bản tham chiếu ~2.5 từ/giây, chia câu 8-14 từ, và bản 'chép lời' lệch ~10% số từ."""
+    rng = random.Random(seed)
+    words = [rng.choice(VOCABULARY) for _ in range(max(3, int(duration * WORDS_PER_SECOND)))]
+    sentences = []
+    i = 0
+    while i < len(words):
+        length = rng.randint(8, 14)
+        sentences.append(' '.join(words[i:i + length]).capitalize() + '.')
+        i += length
+    reference = ' '.join(sentences)
+
+    transcript = []
+    for word in words:
+        roll = rng.random()
+        if roll < 0.04:
+            continue  # bỏ từ
+        transcript.append(rng.choice(VOCABULARY) if roll < 0.08 else word)
+        if roll > 0.98:
+            transcript.append(rng.choice(VOCABULARY))  # chèn từ
+    return reference, ' '.join(transcript), sentences
+
+
+def make_audio(duration, seed):
+    """
+    Âm thanh giống giọng nói: chuỗi 'âm tiết' hữu thanh (F0 100-250 Hz với các họa âm, đường cao độ
+    lên xuống) xen khoảng lặng, cộng nhiễu nền nhỏ. Đủ để đo chi phí, không nhằm được nhận dạng đúng.
+    """
+    rng = np.random.default_rng(seed)
+    sr = FIXTURE_SAMPLE_RATE
+    total = int(duration * sr)
+    signal = np.zeros(total, dtype=np.float32)
+    position = 0
+    while position < total:
+        syllable = int(rng.uniform(0.12, 0.3) * sr)
+        end = min(total, position + syllable)
+        n = end - position
+        t = np.arange(n) / sr
+        f0 = rng.uniform(100, 250) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 4) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / sr
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+        envelope = np.sin(np.pi * np.arange(n) / max(1, n)) ** 2
+        signal[position:end] = 0.2 * voiced * envelope
+        # Khoảng lặng giữa các âm tiết, thỉnh thoảng dài như ngắt câu
+        position = end + int((rng.uniform(0.6, 1.2) if rng.random() < 0.1 else rng.uniform(0.02, 0.12)) * sr)
+    signal += 0.003 * rng.standard_normal(total).astype(np.float32)
+    return signal
+
+
+def build_fixtures(durations, fixtures_dir):
+    fixtures = {}
+    for duration in durations:
+        seed = SEED + int(duration)
+        path = os.path.join(fixtures_dir, f'synthetic_{int(duration)}s.wav')
+        if not os.path.exists(path):
+            sf.write(path, make_audio(duration, seed), FIXTURE_SAMPLE_RATE, subtype='PCM_16')
+        reference, transcript, sentences = make_text(duration, seed)
+        fixtures[duration] = {'path': path, 'reference': reference, 'transcript': transcript, 'sentences': sentences}
+    return fixtures
+
+
+def time_once(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def stage_functions(fixture, speech_array, whisper, gramformer):
+    """Trả về {tên bước: hàm không tham số}. Mỗi hàm chỉ thực hiện đúng một bước của pipeline."""
+    reference = fixture['reference']
+    transcript = preprocess_text(fixture['transcript'])
+    reference_processed = preprocess_text(reference)
+    transcript_phonemes = text_to_phonemes(transcript)
+    reference_phonemes = list(get_reference_entry(reference).phonemes)
+
+    def g2p():
+        # Như pipeline khi cache trống: G2p cho cả reference_text và bản chép lời
+        reference_cache.clear()
+        get_reference_entry(reference)
+        text_to_phonemes(transcript)
+
+    def grammar(backend=None):
+        # Backend ghi nhớ kết quả theo từ: xóa trước mỗi lần đo để không chỉ đo lượt trúng cache
+        def run():
+            clear_grammar_caches()
+            get_grammar_errors_and_grammar_scores(transcript, backend=backend)
+        return run
+
+    def per():
+        alignment = align(reference_phonemes, transcript_phonemes)
+        calculate_per(transcript_phonemes, reference_phonemes, distance=alignment.distance)
+
+    stages = {
+        'decode': lambda: decode_audio(fixture['path'], SAMPLING_RATE),
+        'vad': lambda: find_speech_region(speech_array, SAMPLING_RATE),
+        'g2p': g2p,
+        'per': per,
+        'wer_cer': lambda: calculate_wer_cer(transcript, reference_processed),
+        'intonation': lambda: analyze_intonation(speech_array, SAMPLING_RATE),
+        'grammar_textblob': grammar('textblob'),
+        'grammar': grammar(),
+        'lexical_diversity': lambda: lexical_diversity(transcript)
+    }
+
+    if whisper is not None:
+        processor, model, device = whisper
+        duration = len(speech_array) / SAMPLING_RATE
+        if duration > WHISPER_MAX_SECONDS and Config.LONG_AUDIO_CHUNKING:
+            # Âm thanh dài: feature_extraction và generate xen kẽ theo nhóm đoạn, đo bằng StageTimer của pipeline
+            def whisper_stages():
+                timer = StageTimer()
+                transcribe_long_audio(speech_array, SAMPLING_RATE, processor, model, device, timer=timer)
+                return timer.timings
+            stages['whisper'] = whisper_stages
+        else:
+            features = processor(speech_array, sampling_rate=SAMPLING_RATE, return_tensors="pt").input_features
+            stages['feature_extraction'] = lambda: processor(speech_array, sampling_rate=SAMPLING_RATE, return_tensors="pt")
+            stages['generate'] = lambda: transcribe_features(features, processor, model, device)
+
+    if gramformer is not None:
+        sentences = [preprocess_text(s) for s in fixture['sentences']]
+        corrections = []
+        for sentence in sentences:
+            corrected = gramformer.correct(sentence)
+            corrections.append(next(iter(corrected)) if corrected else sentence)
+        stages['gramformer_correct'] = lambda: [gramformer.correct(s) for s in sentences]
+        stages['gramformer_highlight'] = lambda: [gramformer.highlight(s, c) for s, c in zip(sentences, corrections)]
+
+    return stages
+
+
+def run_stage(name, func, repeat):
+    """Chạy nháp một lần rồi đo `repeat` lần. Bước 'whisper' trả về thời gian theo bước con."""
+    func()
+    samples = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if name == 'whisper':
+            for stage, seconds in result.items():
+                samples.setdefault(stage, []).append(seconds)
+        else:
+            samples.setdefault(name, []).append(elapsed)
+    return {
+        stage: {
+            'median_s': statistics.median(values),
+            'min_s': min(values),
+            'max_s': max(values),
+            'runs': len(values)
+        }
+        for stage, values in samples.items()
+    }
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'model_dir': Config.MODEL_DIR,
+        'whisper_backend': Config.WHISPER_BACKEND,
+        'grammar_backend': Config.GRAMMAR_BACKEND,
+        'pitch_engine': Config.PITCH_ENGINE
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """In chênh lệch median so với baseline; trả về danh sách (duration, stage) bị hồi quy."""
+    regressions = []
+    print(f"\n{'duration':>8} {'stage':<22} {'baseline (ms)':>14} {'current (ms)':>13} {'change':>8}")
+    for duration, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(duration, {}).get(stage)
+            if previous is None:
+                continue
+            before, after = previous['median_s'], current['median_s']
+            change = (after - before) / before if before > 0 else 0.0
+            regressed = change > threshold and (after - before) * 1000 > min_delta_ms
+            if regressed:
+                regressions.append((duration, stage))
+            print(f"{duration:>8} {stage:<22} {before * 1000:>14.2f} {after * 1000:>13.2f} {change:>+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', type=float, nargs='+', default=[5, 30, 120])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip', nargs='*', default=[], choices=sorted(STAGE_GROUPS), help='Bỏ qua nhóm bước')
+    parser.add_argument('--fixtures-dir', default=os.path.join(tempfile.gettempdir(), 'pronunciation_bench_fixtures'))
+    parser.add_argument('--output', default='bench_pipeline.json')
+    parser.add_argument('--baseline', help='JSON của lần chạy trước để so sánh')
+    parser.add_argument('--threshold', type=float, default=0.15, help='Tỉ lệ chậm đi tối đa trước khi báo hồi quy')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='Bỏ qua chênh lệch nhỏ hơn mức này (nhiễu)')
+    args = parser.parse_args()
+
+    os.makedirs(args.fixtures_dir, exist_ok=True)
+    fixtures = build_fixtures(args.durations, args.fixtures_dir)
+
+    whisper = None if 'whisper' in args.skip else load_whisper_model(Config.MODEL_DIR)
+    gramformer = None
+    if 'gramformer' not in args.skip:
+        from gramformer import Gramformer
+        gramformer = Gramformer(models=1, use_gpu=Config.GRAMMAR_USE_GPU)
+
+    results = {}
+    for duration, fixture in fixtures.items():
+        speech_array, _ = decode_audio(fixture['path'], SAMPLING_RATE)
+        stages = stage_functions(fixture, speech_array, whisper, gramformer)
+        if 'textblob' in args.skip:
+            stages.pop('grammar_textblob', None)
+
+        key = f"{int(duration)}s"
+        results[key] = {}
+        print(f"\n== {key} ({len(fixture['reference'].split())} words) ==")
+        for name, func in stages.items():
+            for stage, summary in run_stage(name, func, args.repeat).items():
+                results[key][stage] = summary
+                print(f"{stage:<22} median {summary['median_s'] * 1000:>10.2f} ms  "
+                      f"min {summary['min_s'] * 1000:>10.2f} ms  max {summary['max_s'] * 1000:>10.2f} ms")
+
+    report = {'environment': environment_info(), 'repeat': args.repeat, 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/bench_rss_workers.py
+"""
+Đo bộ nhớ của gunicorn theo số worker, có và không có preload_app.
+
+Với mỗi cấu hình, script khởi động `gunicorn -c gunicorn.conf.py wsgi:app` với MODEL_LOAD_MODE=eager,
+chờ /readyz trả 200 và RSS của mọi worker ổn định (model đã nạp và warm-up xong trong từng worker), rồi cộng RSS và PSS (Proportional Set Size, tính phần bộ nhớ dùng chung chia đều cho các tiến trình)
+của master và toàn bộ worker từ /proc. PSS mới phản ánh đúng tổng bộ nhớ thực tế khi trọng số
+được chia sẻ; RSS đếm trùng các trang dùng chung. Chỉ chạy trên Linux.
+
+    python -m benchmarks.bench_rss_workers --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def read_memory_kb(pid):
+    """Trả về (rss_kb, pss_kb) của một tiến trình từ /proc/<pid>/smaps_rollup."""
+    rss = pss = 0
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Rss:'):
+                    rss = int(line.split()[1])
+                elif line.startswith('Pss:'):
+                    pss = int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    return rss, pss
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == pid:
+                children.append(int(entry))
+        except (FileNotFoundError, ProcessLookupError, IndexError):
+            continue
+    return children
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def wait_until_stable(pids, timeout, tolerance_kb=1024, samples=3, interval=1.0):
+    """Chờ RSS của tất cả tiến trình không đổi quá `tolerance_kb` trong `samples` lần đo liên tiếp."""
+    deadline = time.monotonic() + timeout
+    previous = None
+    stable = 0
+    while time.monotonic() < deadline:
+        current = [read_memory_kb(pid)[0] for pid in pids]
+        if previous is not None and all(abs(a - b) <= tolerance_kb for a, b in zip(current, previous)):
+            stable += 1
+            if stable >= samples:
+                return True
+        else:
+            stable = 0
+        previous = current
+        time.sleep(interval)
+    return False
+
+
+def measure(workers, preload, port, timeout):
+    env = dict(os.environ)
+    env.update({
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_PRELOAD': 'true' if preload else 'false',
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'JOB_WORKERS': '0',
+        # Ở chế độ 'background' mặc định, server trả lời trước khi Whisper được nạp
+        'MODEL_LOAD_MODE': 'eager'
+    })
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_until_ready(f'http://127.0.0.1:{port}/readyz', timeout):
+            raise RuntimeError(f'gunicorn did not become ready within {timeout}s')
+
+        # Chờ đủ số worker được fork xong
+        deadline = time.monotonic() + timeout
+        while len(child_pids(server.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.5)
+
+        # /readyz chỉ trả lời từ một worker: chờ đến khi các worker còn lại cũng nạp/warm-up xong
+        pids = [server.pid] + child_pids(server.pid)
+        if not wait_until_stable(pids, timeout):
+            raise RuntimeError(f'worker memory did not settle within {timeout}s')
+        totals = [read_memory_kb(pid) for pid in pids]
+        return sum(rss for rss, _ in totals) / 1024.0, sum(pss for _, pss in totals) / 1024.0
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark RSS/PSS của gunicorn theo số worker.')
+    parser.add_argument('--workers', nargs='*', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--timeout', type=float, default=180)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'preload':>8} {'RSS total (MB)':>15} {'PSS total (MB)':>15}")
+    for workers in args.workers:
+        for preload in (False, True):
+            rss, pss = measure(workers, preload, args.port, args.timeout)
+            print(f"{workers:>7} {str(preload):>8} {rss:>15.1f} {pss:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
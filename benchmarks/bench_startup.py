@@ -0,0 +1,102 @@
+# benchmarks/bench_startup.py
+"""
+Đo thời gian khởi động của ứng dụng theo MODEL_LOAD_MODE và MODEL_WARMUP.
+
+Mỗi cấu hình chạy trong một tiến trình Python mới (cache import sạch) và đo:
+  - import_s: thời gian `import app` (thời điểm server có thể nhận kết nối, /healthz trả 200)
+  - ready_s: thời gian từ lúc bắt đầu đến khi runtime sẵn sàng (/readyz trả 200)
+  - first_request_s: độ trễ của lần đánh giá đầu tiên trên âm thanh tổng hợp sau khi sẵn sàng
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --modes background lazy --importtime
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_SCRIPT = r'''
+import json, time
+start = time.perf_counter()
+import app
+import_s = time.perf_counter() - start
+app.whisper.start_background()
+ready = app.whisper.wait_until_ready(timeout=TIMEOUT)
+ready_s = time.perf_counter() - start
+
+first_request_s = None
+if ready:
+    import numpy as np
+    from pronunciation_assessment import SAMPLING_RATE, pronunciation_assessment_configured_with_whisper
+    t = np.arange(3 * SAMPLING_RATE, dtype=np.float32) / SAMPLING_RATE
+    speech_array = (0.1 * np.sin(2 * np.pi * 180.0 * t)).astype(np.float32)
+    request_start = time.perf_counter()
+    runtime = app.whisper.get()
+    pronunciation_assessment_configured_with_whisper(
+        filename='<bench>', language='en-US', reference_text='the quick brown fox',
+        processor=runtime.processor, model=runtime.model, device=runtime.device,
+        speech_array=speech_array
+    )
+    first_request_s = time.perf_counter() - request_start
+print('RESULT ' + json.dumps({'import_s': import_s, 'ready_s': ready_s if ready else None, 'first_request_s': first_request_s}))
+'''
+
+
+def run_config(mode, warm_up, timeout):
+    env = dict(os.environ, MODEL_LOAD_MODE=mode, MODEL_WARMUP='true' if warm_up else 'false')
+    script = CHILD_SCRIPT.replace('TIMEOUT', str(timeout))
+    completed = subprocess.run(
+        [sys.executable, '-c', script], cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=timeout + 120
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith('RESULT '):
+            return json.loads(line[len('RESULT '):])
+    raise RuntimeError(f"{mode} (warm_up={warm_up}) failed:\n{completed.stderr[-2000:]}")
+
+
+def print_import_profile(top):
+    """Các module tốn thời gian import nhất khi `import app` (theo python -X importtime)."""
+    env = dict(os.environ, MODEL_LOAD_MODE='lazy')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.split('|')]
+        rows.append((int(cumulative_us), name.strip()))
+    print(f"\nTop {top} imports by cumulative time (MODEL_LOAD_MODE=lazy):")
+    for cumulative_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>10.1f} ms  {name}")
+
+
+def format_seconds(value):
+    return f"{value:>10.2f}" if value is not None else f"{'-':>10}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['eager', 'background', 'lazy'])
+    parser.add_argument('--timeout', type=float, default=600.0, help='Thời gian chờ sẵn sàng tối đa (giây)')
+    parser.add_argument('--importtime', action='store_true', help='In các module import chậm nhất')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    print(f"{'mode':>11} {'warm-up':>8} {'import (s)':>10} {'ready (s)':>10} {'1st req (s)':>11}")
+    for mode in args.modes:
+        for warm_up in (False, True):
+            result = run_config(mode, warm_up, args.timeout)
+            print(f"{mode:>11} {str(warm_up):>8} {format_seconds(result['import_s'])} "
+                  f"{format_seconds(result['ready_s'])} {format_seconds(result['first_request_s']):>11}")
+
+    if args.importtime:
+        print_import_profile(args.top)
+
+
+if __name__ == '__main__':
+    main()
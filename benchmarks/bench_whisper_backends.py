@@ -0,0 +1,128 @@
+# benchmarks/bench_whisper_backends.py
+"""
+So sánh các backend suy luận Whisper trên một tập clip cố định:
+  - độ chính xác: WER so với transcript chuẩn, và mức tăng WER so với backend 'torch' (kiểm tra hồi quy)
+  - độ trễ mỗi clip (p50/p95) và thông lượng khi chạy theo batch
+
+Tập clip là một thư mục chứa các cặp <tên>.wav/.mp3/.flac/.m4a và <tên>.txt (transcript chuẩn).
+
+    python -m benchmarks.bench_whisper_backends --clips data/clips --backends torch torch-int8 onnx
+    python -m benchmarks.bench_whisper_backends --clips data/clips --max-wer-increase 2.0
+
+Script trả về mã lỗi 1 nếu WER của một backend tăng quá --max-wer-increase điểm phần trăm so với 'torch'.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from jiwer import wer
+
+from config import Config
+from pronunciation_assessment import (
+    SAMPLING_RATE, decode_audio, load_whisper_model, preprocess_text, transcribe_features
+)
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.m4a')
+
+
+def load_clip_set(directory):
+    clips = []
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        transcript_path = os.path.join(directory, stem + '.txt')
+        if ext.lower() in AUDIO_EXTENSIONS and os.path.exists(transcript_path):
+            with open(transcript_path, 'r', encoding='utf-8') as f:
+                reference = preprocess_text(f.read().strip())
+            speech_array, _ = decode_audio(os.path.join(directory, name), SAMPLING_RATE)
+            clips.append((name, speech_array, reference))
+    return clips
+
+
+def percentile(values, q):
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def evaluate_backend(backend, model_dir, clips, batch_size):
+    processor, model, device = load_whisper_model(model_dir, backend=backend)
+
+    # Chạy nháp một lần để loại bỏ chi phí khởi tạo kernel
+    warmup = processor(clips[0][1], sampling_rate=SAMPLING_RATE, return_tensors="pt").input_features
+    transcribe_features(warmup, processor, model, device)
+
+    hypotheses = []
+    latencies = []
+    for _, speech_array, _ in clips:
+        input_features = processor(speech_array, sampling_rate=SAMPLING_RATE, return_tensors="pt").input_features
+        start = time.perf_counter()
+        hypotheses.append(preprocess_text(transcribe_features(input_features, processor, model, device)[0]))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(clips), batch_size):
+        group = [speech_array for _, speech_array, _ in clips[i:i + batch_size]]
+        input_features = processor(group, sampling_rate=SAMPLING_RATE, return_tensors="pt").input_features
+        transcribe_features(input_features, processor, model, device)
+    batch_elapsed = time.perf_counter() - start
+
+    return {
+        'wer': wer([reference for _, _, reference in clips], hypotheses) * 100,
+        'p50': statistics.median(latencies),
+        'p95': percentile(latencies, 95),
+        'throughput': len(clips) / batch_elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='So sánh độ chính xác và tốc độ của các backend Whisper.')
+    parser.add_argument('--clips', required=True, help='Thư mục chứa các cặp tệp âm thanh và transcript .txt')
+    parser.add_argument('--model-dir', default=Config.MODEL_DIR)
+    parser.add_argument('--backends', nargs='*', default=['torch', 'torch-int8', 'onnx'])
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-wer-increase', type=float, default=2.0,
+                        help='Mức tăng WER tối đa (điểm %%) so với backend torch (hoặc backend đầu tiên chạy được) trước khi báo hồi quy')
+    args = parser.parse_args()
+
+    clips = load_clip_set(args.clips)
+    if not clips:
+        sys.exit(f"No clips with transcripts found in {args.clips}")
+
+    backends = list(args.backends)
+    if 'torch' not in backends:
+        backends.insert(0, 'torch')
+
+    results = {}
+    for backend in backends:
+        try:
+            results[backend] = evaluate_backend(backend, args.model_dir, clips, args.batch_size)
+        except Exception as e:
+            # Thiếu thư viện (ImportError) hoặc không nạp được model/ONNX: vẫn báo cáo các backend còn lại
+            print(f"Skipping {backend}: {e}")
+
+    if not results:
+        sys.exit("No backend could be evaluated")
+
+    # So với torch; nếu torch không chạy được thì so với backend đầu tiên chạy được
+    baseline_backend = 'torch' if 'torch' in results else next(iter(results))
+    if baseline_backend != 'torch':
+        print(f"torch backend unavailable, ΔWER is relative to {baseline_backend}")
+    baseline = results[baseline_backend]['wer']
+    regressions = []
+    print(f"{'backend':<12} {'WER %':>7} {'ΔWER':>7} {'p50 (s)':>8} {'p95 (s)':>8} {'clips/s':>8}")
+    for backend, r in results.items():
+        delta = r['wer'] - baseline
+        print(f"{backend:<12} {r['wer']:>7.2f} {delta:>+7.2f} {r['p50']:>8.3f} {r['p95']:>8.3f} {r['throughput']:>8.2f}")
+        if delta > args.max_wer_increase:
+            regressions.append(backend)
+
+    if regressions:
+        print(f"WER regression above {args.max_wer_increase} points: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+# benchmarks/load_replay.py
+"""
+Phát lại một manifest request (CSV/JSONL như của batch_assess.py) vào endpoint đánh giá phát âm
+với tốc độ đến cố định (open-loop): request được gửi theo lịch, không chờ request trước trả về,
+nên độ trễ đo được gồm cả thời gian xếp hàng khi server quá tải (tránh coordinated omission).
+
+Hai chế độ:
+  - trong tiến trình: --target inprocess (dùng app.test_client(), không cần chạy server)
+  - qua HTTP: --target http://127.0.0.1:5000 (server đã chạy, ví dụ gunicorn)
+
+JWT được lấy qua /login. Báo cáo: thông lượng, p50/p95/p99, tỉ lệ lỗi theo mã HTTP và RSS của server
+theo thời gian (--server-pid cho chế độ HTTP, cộng cả các tiến trình con như worker gunicorn).
+
+Nên tắt cache kết quả (RESULT_CACHE_ENABLED=false) khi đo, nếu không các lần phát lại cùng một tệp
+sẽ trả về từ cache, và tắt giới hạn tần suất (RATELIMIT_ENABLED=false) vì mọi request dùng chung một
+JWT identity. Ở chế độ trong tiến trình, --disable-result-cache và --disable-rate-limit làm việc này.
+
+    python -m benchmarks.load_replay manifest.jsonl --target inprocess --rate 2 --duration 60 \\
+        --disable-result-cache --disable-rate-limit
+    python -m benchmarks.load_replay manifest.jsonl --target http://127.0.0.1:5000 --rate 5 --duration 120 \\
+        --server-pid $(pgrep -f 'gunicorn: master') --output load_report.json
+"""
+
+import argparse
+import json
+import math
+import mimetypes
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_rss_workers import child_pids, read_memory_kb
+
+
+def read_requests(path):
+    """Đọc manifest và nạp sẵn nội dung âm thanh vào bộ nhớ (để đọc đĩa không ảnh hưởng phép đo)."""
+    from batch_assess import read_manifest
+
+    items = read_manifest(path)
+    for item in items:
+        with open(item['audio_path'], 'rb') as f:
+            item['audio'] = f.read()
+        item['filename'] = os.path.basename(item['audio_path'])
+    return items
+
+
+def arrival_offsets(rate, duration, max_requests, process, seed):
+    """Thời điểm gửi (giây, tính từ lúc bắt đầu): cách đều hoặc theo quá trình Poisson."""
+    rng = random.Random(seed)
+    offsets = []
+    t = 0.0
+    while t < duration and (max_requests is None or len(offsets) < max_requests):
+        offsets.append(t)
+        t += rng.expovariate(rate) if process == 'poisson' else 1.0 / rate
+    return offsets
+
+
+def percentile(sorted_values, q):
+    """Percentile theo nearest-rank."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class InProcessClient:
+    """Gửi request qua Flask test client (app được import trong tiến trình hiện tại)."""
+
+    def __init__(self, disable_result_cache=False, disable_rate_limit=False):
+        import app as app_module
+
+        # config có thể đã được import trước đó (ví dụ qua batch_assess), khi đó biến môi trường
+        # không còn tác dụng: tắt trực tiếp trên app đã nạp
+        if disable_result_cache:
+            app_module.app.config['RESULT_CACHE_ENABLED'] = False
+            app_module.result_cache = None
+        if disable_rate_limit:
+            app_module.app.config['RATELIMIT_ENABLED'] = False
+            app_module.limiter.enabled = False
+
+        self.app = app_module.app
+        app_module.whisper.get()
+
+    def login(self, username, password):
+        response = self.app.test_client().post('/login', json={'username': username, 'password': password})
+        if response.status_code != 200:
+            raise RuntimeError(f"Login failed ({response.status_code}): {response.get_data(as_text=True)}")
+        return response.get_json()['access_token']
+
+    def assess(self, path, item, token):
+        import io
+
+        response = self.app.test_client().post(
+            path,
+            data={
+                'file': (io.BytesIO(item['audio']), item['filename']),
+                'reference_text': item['reference_text'],
+                'language': item['language']
+            },
+            headers={'Authorization': f'Bearer {token}'},
+            content_type='multipart/form-data'
+        )
+        return response.status_code
+
+    def server_pids(self):
+        return [os.getpid()]
+
+
+class HttpClient:
+    """Gửi request multipart qua HTTP tới server đang chạy."""
+
+    def __init__(self, base_url, timeout, server_pid=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.server_pid = server_pid
+
+    def login(self, username, password):
+        request = urllib.request.Request(
+            self.base_url + '/login',
+            data=json.dumps({'username': username, 'password': password}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())['access_token']
+
+    def assess(self, path, item, token):
+        boundary = uuid.uuid4().hex
+        body = bytearray()
+        for name in ('reference_text', 'language'):
+            body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                     f'{item[name]}\r\n').encode('utf-8')
+        content_type = mimetypes.guess_type(item['filename'])[0] or 'application/octet-stream'
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{item["filename"]}"\r\n'
+                 f'Content-Type: {content_type}\r\n\r\n').encode('utf-8')
+        body += item['audio'] + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=bytes(body),
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}', 'Authorization': f'Bearer {token}'},
+            method='POST'
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except (urllib.error.URLError, TimeoutError, ConnectionError):
+            return 'connection_error'
+
+    def server_pids(self):
+        if self.server_pid is None:
+            return []
+        return [self.server_pid] + child_pids(self.server_pid)
+
+
+def sample_rss(client, stop, interval, state, timeline):
+    """Mỗi `interval` giây ghi RSS/PSS của server cùng số request đã xong, lỗi và đang chạy."""
+    start = time.monotonic()
+    while not stop.wait(interval):
+        rss = pss = 0
+        for pid in client.server_pids():
+            pid_rss, pid_pss = read_memory_kb(pid)
+            rss += pid_rss
+            pss += pid_pss
+        with state['lock']:
+            timeline.append({
+                't': round(time.monotonic() - start, 2),
+                'rss_mb': round(rss / 1024, 1),
+                'pss_mb': round(pss / 1024, 1),
+                'completed': state['completed'],
+                'errors': state['errors'],
+                'in_flight': state['in_flight']
+            })
+
+
+def replay(client, items, offsets, path, token, max_in_flight, rss_interval):
+    results = []
+    timeline = []
+    state = {'lock': threading.Lock(), 'completed': 0, 'errors': 0, 'in_flight': 0}
+    stop = threading.Event()
+    sampler = threading.Thread(target=sample_rss, args=(client, stop, rss_interval, state, timeline), daemon=True)
+
+    def send(item, scheduled):
+        with state['lock']:
+            state['in_flight'] += 1
+        try:
+            status = client.assess(path, item, token)
+        except Exception as e:
+            status = f'exception:{type(e).__name__}'
+        finished = time.monotonic()
+        ok = status == 200
+        with state['lock']:
+            state['in_flight'] -= 1
+            state['completed'] += 1
+            state['errors'] += 0 if ok else 1
+            # Độ trễ tính từ thời điểm theo lịch, không phải lúc thread bắt đầu gửi
+            results.append({'id': item['id'], 'status': status, 'latency_s': finished - scheduled})
+
+    sampler.start()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for i, offset in enumerate(offsets):
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, items[i % len(items)], start + offset)
+    wall_seconds = time.monotonic() - start
+    stop.set()
+    sampler.join()
+    return results, timeline, wall_seconds
+
+
+def summarize(results, wall_seconds, offered_rate):
+    latencies = sorted(r['latency_s'] for r in results if r['status'] == 200)
+    status_counts = {}
+    for r in results:
+        status_counts[str(r['status'])] = status_counts.get(str(r['status']), 0) + 1
+    errors = len(results) - len(latencies)
+    return {
+        'requests': len(results),
+        'offered_rate_rps': offered_rate,
+        'throughput_rps': len(latencies) / wall_seconds if wall_seconds > 0 else 0.0,
+        'wall_seconds': wall_seconds,
+        'error_rate': errors / len(results) if results else 0.0,
+        'status_counts': status_counts,
+        'latency_s': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+            'mean': sum(latencies) / len(latencies) if latencies else None
+        }
+    }
+
+
+def format_ms(value):
+    return f"{value * 1000:.0f} ms" if value is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', help='Manifest CSV/JSONL (audio_path, reference_text, language)')
+    parser.add_argument('--target', default='inprocess', help="'inprocess' hoặc URL gốc của server")
+    parser.add_argument('--endpoint', default='/api/pronunciation-assessment')
+    parser.add_argument('--rate', type=float, required=True, help='Số request mỗi giây (open-loop)')
+    parser.add_argument('--duration', type=float, default=60.0, help='Thời gian phát lại (giây)')
+    parser.add_argument('--max-requests', type=int, help='Dừng sau số request này')
+    parser.add_argument('--arrival', choices=['poisson', 'uniform'], default='poisson')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-in-flight', type=int, default=256, help='Số request đang gửi tối đa phía client')
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--server-pid', type=int, help='PID của server (chế độ HTTP) để đo RSS')
+    parser.add_argument('--rss-interval', type=float, default=1.0)
+    parser.add_argument('--disable-result-cache', action='store_true', help='Tắt cache kết quả (chỉ chế độ inprocess)')
+    parser.add_argument('--disable-rate-limit', action='store_true', help='Tắt giới hạn tần suất (chỉ chế độ inprocess)')
+    parser.add_argument('--output', help='Ghi báo cáo đầy đủ (kèm từng request và timeline) ra JSON')
+    args = parser.parse_args()
+
+    # Config đọc biến môi trường khi được import lần đầu (read_requests import batch_assess -> config),
+    # nên phải đặt trước mọi import của dự án
+    if args.target == 'inprocess':
+        if args.disable_result_cache:
+            os.environ['RESULT_CACHE_ENABLED'] = 'false'
+        if args.disable_rate_limit:
+            os.environ['RATELIMIT_ENABLED'] = 'false'
+
+    items = read_requests(args.manifest)
+    if not items:
+        parser.error('Manifest has no usable rows')
+
+    if args.target == 'inprocess':
+        client = InProcessClient(
+            disable_result_cache=args.disable_result_cache,
+            disable_rate_limit=args.disable_rate_limit
+        )
+    else:
+        client = HttpClient(args.target, args.timeout, server_pid=args.server_pid)
+    token = client.login(args.username, args.password)
+
+    offsets = arrival_offsets(args.rate, args.duration, args.max_requests, args.arrival, args.seed)
+    print(f"Replaying {len(offsets)} requests ({len(items)} distinct) at {args.rate} req/s ({args.arrival}) "
+          f"against {args.target}{args.endpoint}")
+    results, timeline, wall_seconds = replay(
+        client, items, offsets, args.endpoint, token, args.max_in_flight, args.rss_interval
+    )
+
+    summary = summarize(results, wall_seconds, args.rate)
+    latency = summary['latency_s']
+    print(f"\nThroughput:  {summary['throughput_rps']:.2f} req/s (offered {args.rate} req/s)")
+    print(f"Latency:     p50 {format_ms(latency['p50'])}  p95 {format_ms(latency['p95'])}  "
+          f"p99 {format_ms(latency['p99'])}  max {format_ms(latency['max'])}")
+    print(f"Errors:      {summary['error_rate']:.1%}  {summary['status_counts']}")
+    if timeline:
+        peak = max(timeline, key=lambda row: row['rss_mb'])
+        print(f"Server RSS:  start {timeline[0]['rss_mb']} MB, peak {peak['rss_mb']} MB at t={peak['t']}s, "
+              f"end {timeline[-1]['rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'summary': summary, 'timeline': timeline, 'requests': results}, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -42,6 +42,22 @@ class Config:
     
     # Cấu hình logging
     LOG_FILE = 'logs/app.log'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # 'text' hoặc 'json' (mỗi dòng một object, kèm request_id và timings)
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() == 'true'  # Ghi log qua QueueHandler/QueueListener, không chặn request
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # Hàng đợi đầy thì bỏ record (đếm ở log_records_dropped_total)
+    # Cách ghi tệp log khi có nhiều tiến trình (worker gunicorn, job worker, batch):
+    #   'watched'  - mọi tiến trình ghi nối (O_APPEND) vào cùng tệp, xoay vòng bằng logrotate bên ngoài
+    #   'rotating' - tự xoay vòng theo kích thước; chỉ an toàn khi chạy một tiến trình (flask run)
+    #   'none'     - chỉ ghi ra stdout/stderr (để gunicorn/systemd/docker thu thập)
+    LOG_FILE_MODE = os.getenv('LOG_FILE_MODE', 'watched')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))  # Chế độ 'rotating': xoay vòng khi vượt 10MB
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    # Mức log riêng cho từng thư viện, dạng 'tên=MỨC,...'
+    LOG_LIBRARY_LEVELS = os.getenv(
+        'LOG_LIBRARY_LEVELS',
+        'numba=WARNING,urllib3=WARNING,filelock=WARNING,matplotlib=WARNING,PIL=WARNING,h5py=WARNING'
+    )
     
     # Cấu hình cơ sở dữ liệu
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///api_keys.db')
@@ -50,3 +66,99 @@ class Config:
     # Cấu hình JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key')  # Thay 'your-jwt-secret-key' bằng khóa bí mật thực tế
     #JWT_ACCESS_TOKEN_EXPIRES = 3600  # Token hết hạn sau 1 giờ
+
+    # Cấu hình gom batch (dynamic batching) cho Whisper giữa các request đồng thời
+    WHISPER_BATCHING_ENABLED = os.getenv('WHISPER_BATCHING_ENABLED', 'true').lower() == 'true'
+    WHISPER_BATCH_MAX_SIZE = int(os.getenv('WHISPER_BATCH_MAX_SIZE', 8))
+    WHISPER_BATCH_MAX_WAIT_MS = float(os.getenv('WHISPER_BATCH_MAX_WAIT_MS', 20))
+
+    # Cache phoneme/chuẩn hóa cho reference_text (LRU) và tệp ngân hàng câu mẫu để nạp trước khi khởi động
+    REFERENCE_CACHE_SIZE = int(os.getenv('REFERENCE_CACHE_SIZE', 4096))
+    PROMPT_BANK_FILE = os.getenv('PROMPT_BANK_FILE', None)
+
+    # Cách xử lý tệp upload: 'disk' (lưu vào UPLOAD_FOLDER), 'stream' (đọc trực tiếp từ request)
+    # hoặc 'spooled' (buffer trong bộ nhớ, chỉ tràn ra tệp tạm khi vượt UPLOAD_SPOOL_MAX_SIZE)
+    UPLOAD_MODE = os.getenv('UPLOAD_MODE', 'spooled')
+    UPLOAD_SPOOL_MAX_SIZE = int(os.getenv('UPLOAD_SPOOL_MAX_SIZE', 10 * 1024 * 1024))  # 10MB
+
+    # Chép lời âm thanh dài (> 30 giây) theo từng đoạn cắt tại khoảng lặng
+    LONG_AUDIO_CHUNKING = os.getenv('LONG_AUDIO_CHUNKING', 'true').lower() == 'true'
+    LONG_AUDIO_MAX_CHUNK_SECONDS = float(os.getenv('LONG_AUDIO_MAX_CHUNK_SECONDS', 28.0))
+    LONG_AUDIO_OVERLAP_SECONDS = float(os.getenv('LONG_AUDIO_OVERLAP_SECONDS', 1.0))
+    LONG_AUDIO_BATCH_SIZE = int(os.getenv('LONG_AUDIO_BATCH_SIZE', 4))
+
+    # Hàng đợi job đánh giá bất đồng bộ (lưu trong SQLite) và số tiến trình worker xử lý
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 1))
+    JOB_WORKER_TORCH_THREADS = int(os.getenv('JOB_WORKER_TORCH_THREADS', 0))  # 0 = mặc định của torch
+    JOB_AUDIO_FOLDER = os.getenv('JOB_AUDIO_FOLDER', os.path.join('uploads', 'jobs'))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 0.5))
+    JOB_MAX_WAIT_SECONDS = float(os.getenv('JOB_MAX_WAIT_SECONDS', 30))
+
+    # Chạy production với gunicorn (xem gunicorn.conf.py)
+    TORCH_NUM_THREADS_PER_WORKER = int(os.getenv('TORCH_NUM_THREADS_PER_WORKER', 0))  # 0 = số core / số worker
+    MODEL_SHARE_MEMORY = os.getenv('MODEL_SHARE_MEMORY', 'true').lower() == 'true'
+
+    # Xác thực API key: cache TTL trong tiến trình (cả key không hợp lệ) và ghi số lượt dùng theo lô
+    API_KEY_CACHE_TTL_SECONDS = float(os.getenv('API_KEY_CACHE_TTL_SECONDS', 60))
+    # Chu kỳ đọc bộ đếm thay đổi API key dùng chung: thời gian tối đa tiến trình khác còn nhận key đã vô hiệu hóa
+    API_KEY_REVISION_CHECK_SECONDS = float(os.getenv('API_KEY_REVISION_CHECK_SECONDS', 1))
+    API_KEY_NEGATIVE_CACHE_TTL_SECONDS = float(os.getenv('API_KEY_NEGATIVE_CACHE_TTL_SECONDS', 10))
+    API_KEY_CACHE_SIZE = int(os.getenv('API_KEY_CACHE_SIZE', 10000))
+    API_KEY_USAGE_FLUSH_SECONDS = float(os.getenv('API_KEY_USAGE_FLUSH_SECONDS', 10))
+
+    # Kiểm soát tải: số lượt đánh giá chạy đồng thời trong mỗi tiến trình và hàng đợi chờ có giới hạn.
+    # Dưới gunicorn, số thread mặc định = MAX_CONCURRENT + MAX_QUEUE + 2 (xem gunicorn.conf.py)
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 4))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 16))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_SECONDS', 10))
+
+    # Giới hạn tần suất theo JWT identity / API key / địa chỉ IP (Flask-Limiter)
+    # Dùng redis://... cho RATELIMIT_STORAGE_URI khi chạy nhiều worker để các worker dùng chung bộ đếm
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_HEADERS_ENABLED = True  # Thêm X-RateLimit-* và Retry-After vào response
+    ASSESSMENT_RATE_LIMIT = os.getenv('ASSESSMENT_RATE_LIMIT', '30/minute')
+
+    # Cắt khoảng lặng đầu/cuối theo năng lượng trước Whisper; bản ghi không có tiếng nói được trả kết quả ngay
+    VAD_ENABLED = os.getenv('VAD_ENABLED', 'true').lower() == 'true'
+    VAD_TOP_DB = float(os.getenv('VAD_TOP_DB', 35))  # Khung thấp hơn mức to nhất quá ngưỡng này là khoảng lặng
+    VAD_FLOOR_DB = float(os.getenv('VAD_FLOOR_DB', -50))  # Ngưỡng tuyệt đối (dBFS), loại nhiễu nền
+    VAD_MIN_SPEECH_SECONDS = float(os.getenv('VAD_MIN_SPEECH_SECONDS', 0.15))
+    VAD_PADDING_SECONDS = float(os.getenv('VAD_PADDING_SECONDS', 0.2))
+
+    # Số reference_text tối đa trong một request chấm nhiều đáp án
+    MAX_REFERENCE_TEXTS = int(os.getenv('MAX_REFERENCE_TEXTS', 10))
+
+    # Khởi động nhanh: 'eager' (nạp model khi import app), 'background' (nạp trong thread nền) hoặc 'lazy' (khi request đầu tiên)
+    MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'background')
+    MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'true').lower() == 'true'  # Chạy pipeline một lần trước khi báo sẵn sàng
+    NLTK_AUTO_DOWNLOAD = os.getenv('NLTK_AUTO_DOWNLOAD', 'true').lower() == 'true'  # Chỉ tải dữ liệu NLTK khi còn thiếu
+
+    # Backend chấm ngữ pháp: 'vocabulary' (mặc định, nhanh), 'textblob' hoặc 'gramformer' (chậm, chất lượng cao)
+    GRAMMAR_BACKEND = os.getenv('GRAMMAR_BACKEND', 'vocabulary')
+    GRAMMAR_VOCABULARY_FILE = os.getenv('GRAMMAR_VOCABULARY_FILE', None)  # Mặc định dùng từ vựng của TextBlob
+    GRAMMAR_WORD_CACHE_SIZE = int(os.getenv('GRAMMAR_WORD_CACHE_SIZE', 65536))
+    GRAMMAR_USE_GPU = os.getenv('GRAMMAR_USE_GPU', 'false').lower() == 'true'
+    GRAMFORMER_NUM_BEAMS = int(os.getenv('GRAMFORMER_NUM_BEAMS', 1))  # 1 = greedy, nhanh nhất
+    GRAMFORMER_BATCH_SIZE = int(os.getenv('GRAMFORMER_BATCH_SIZE', 16))
+
+    # Backend suy luận Whisper: 'torch' (FP32), 'torch-int8' (lượng tử hóa động, CPU) hoặc 'onnx' (ONNX Runtime)
+    WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'torch')
+    WHISPER_ONNX_DIR = os.getenv('WHISPER_ONNX_DIR', None)  # Mặc định: <MODEL_DIR>/onnx
+
+    # Cache kết quả cho bài nộp trùng lặp (cùng âm thanh, reference_text, ngôn ngữ, model và cấu hình chấm)
+    RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 1024))
+    RESULT_CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL_SECONDS', 3600))
+    RESULT_CACHE_DB_ENABLED = os.getenv('RESULT_CACHE_DB_ENABLED', 'false').lower() == 'true'  # Tầng SQLite dùng chung giữa các worker
+
+    # Phân tích cao độ (F0): 'praat' (praat-parselmouth) hoặc 'yin' (librosa)
+    PITCH_ENGINE = os.getenv('PITCH_ENGINE', 'praat')
+    PITCH_FLOOR = float(os.getenv('PITCH_FLOOR', 75.0))
+    PITCH_CEILING = float(os.getenv('PITCH_CEILING', 500.0))
+
+    # Đánh giá theo thời gian thực qua WebSocket: giới hạn độ dài mỗi kết nối, cửa sổ chép lời và tần suất kết quả tạm thời
+    STREAM_MAX_SECONDS = float(os.getenv('STREAM_MAX_SECONDS', 120))
+    STREAM_WINDOW_SECONDS = float(os.getenv('STREAM_WINDOW_SECONDS', 28))
+    STREAM_PARTIAL_INTERVAL_SECONDS = float(os.getenv('STREAM_PARTIAL_INTERVAL_SECONDS', 2.0))
@@ -1,5 +1,8 @@
 class Gramformer:
 
+  # Các thành phần spaCy mà ERRANT không dùng khi căn chỉnh và phân loại lỗi
+  ERRANT_UNUSED_PIPES = ('ner', 'entity_ruler', 'entity_linker', 'textcat', 'textcat_multilabel', 'senter')
+
   def __init__(self, models=1, use_gpu=False):
     from transformers import AutoTokenizer
     from transformers import AutoModelForSeq2SeqLM
@@ -57,11 +60,59 @@ class Gramformer:
         print("Model is not loaded")  
         return None
 
+  def correct_batch(self, input_sentences, max_candidates=1, num_beams=7, do_sample=True, max_length=128, batch_size=16):
+      """
+      Sửa nhiều câu cùng lúc: tokenize có padding và chạy một lần generate cho mỗi batch.
+      Trả về danh sách các set câu đã sửa, theo đúng thứ tự đầu vào.
+      Dùng num_beams=1, do_sample=False (greedy) khi cần độ trễ thấp.
+      """
+      if not self.model_loaded:
+        print("Model is not loaded")
+        return None
+
+      import torch
+      correction_prefix = "gec: "
+      num_return_sequences = min(max_candidates, num_beams) if not do_sample else max_candidates
+      results = []
+
+      for start in range(0, len(input_sentences), batch_size):
+        batch = [correction_prefix + sentence for sentence in input_sentences[start:start + batch_size]]
+        encoded = self.correction_tokenizer(batch, return_tensors='pt', padding=True, truncation=True, max_length=max_length)
+        encoded = encoded.to(self.device)
+
+        with torch.no_grad():
+          preds = self.correction_model.generate(
+              input_ids=encoded['input_ids'],
+              attention_mask=encoded['attention_mask'],
+              do_sample=do_sample,
+              max_length=max_length,
+              num_beams=num_beams,
+              early_stopping=num_beams > 1,
+              num_return_sequences=num_return_sequences)
+
+        # generate trả về num_return_sequences dòng liên tiếp cho mỗi câu đầu vào
+        decoded = self.correction_tokenizer.batch_decode(preds, skip_special_tokens=True)
+        for i in range(len(batch)):
+          candidates = decoded[i * num_return_sequences:(i + 1) * num_return_sequences]
+          results.append(set(c.strip() for c in candidates))
+
+      return results
+
   def highlight(self, orig, cor):
       edits = self._get_edits(orig, cor)
-      orig_tokens = orig.split()
+      return self._highlight_from_edits(orig, edits)
 
-      ignore_indexes = []
+  def highlight_batch(self, pairs, batch_size=64):
+      """
+      Đánh dấu lỗi cho nhiều cặp (câu gốc, câu đã sửa) cùng lúc, ví dụ cả một bài nói/bài luận.
+      """
+      all_edits = self.get_edits_batch(pairs, batch_size=batch_size)
+      return [self._highlight_from_edits(orig, edits) for (orig, _), edits in zip(pairs, all_edits)]
+
+  def _highlight_from_edits(self, orig, edits):
+      # Một lượt tuyến tính: thay token tại vị trí lỗi, đánh dấu các token cần bỏ rồi ghép một lần
+      orig_tokens = orig.split()
+      ignore_indexes = set()
 
       for edit in edits:
           edit_type = edit[0]
@@ -71,8 +122,7 @@ class Gramformer:
           edit_str_end = edit[4]
 
           # if no_of_tokens(edit_str_start) > 1 ==> excluding the first token, mark all other tokens for deletion
-          for i in range(edit_spos+1, edit_epos):
-            ignore_indexes.append(i)
+          ignore_indexes.update(range(edit_spos+1, edit_epos))
 
           if edit_str_start == "":
               if edit_spos - 1 >= 0:
@@ -96,10 +146,7 @@ class Gramformer:
                 edit_str_end + "'>" + edit_str_start + "</c>"
             orig_tokens[edit_spos] = st
 
-      for i in sorted(ignore_indexes, reverse=True):
-        del(orig_tokens[i])
-
-      return(" ".join(orig_tokens))
+      return " ".join(token for i, token in enumerate(orig_tokens) if i not in ignore_indexes)
 
   def detect(self, input_sentence):
         # TO BE IMPLEMENTED
@@ -108,6 +155,9 @@ class Gramformer:
   def _get_edits(self, orig, cor):
         orig = self.annotator.parse(orig)
         cor = self.annotator.parse(cor)
+        return self._edits_from_parsed(orig, cor)
+
+  def _edits_from_parsed(self, orig, cor):
         alignment = self.annotator.align(orig, cor)
         edits = self.annotator.merge(alignment)
 
@@ -124,5 +174,23 @@ class Gramformer:
         else:    
             return []
 
+  def _parse_batch(self, texts, batch_size=64):
+        # Tách token theo khoảng trắng giống annotator.parse, rồi chạy spaCy một lượt bằng nlp.pipe,
+        # chỉ giữ các thành phần ERRANT cần (tagger, parser, lemmatizer...)
+        from spacy.tokens import Doc
+        nlp = self.annotator.nlp
+        unused = [name for name in nlp.pipe_names if name in self.ERRANT_UNUSED_PIPES]
+        docs = (Doc(nlp.vocab, words=text.split()) for text in texts)
+        with nlp.select_pipes(disable=unused):
+            return list(nlp.pipe(docs, batch_size=batch_size))
+
   def get_edits(self, orig, cor):
-      return self._get_edits(orig, cor)
\ No newline at end of file
+      return self._get_edits(orig, cor)
+
+  def get_edits_batch(self, pairs, batch_size=64):
+      """
+      Trích xuất lỗi cho nhiều cặp (câu gốc, câu đã sửa), parse tất cả trong một lượt nlp.pipe.
+      """
+      texts = [text for pair in pairs for text in pair]
+      parsed = self._parse_batch(texts, batch_size=batch_size)
+      return [self._edits_from_parsed(parsed[2 * i], parsed[2 * i + 1]) for i in range(len(pairs))]
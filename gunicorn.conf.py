@@ -0,0 +1,73 @@
+# gunicorn.conf.py
+# Cấu hình gunicorn: tải Whisper một lần trong master (preload_app) rồi fork các worker,
+# để trọng số model được chia sẻ giữa các worker thay vì mỗi worker giữ một bản riêng.
+
+import gc
+import logging
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+# Mỗi worker phục vụ nhiều request đồng thời bằng thread để WhisperBatcher gom được batch
+worker_class = 'gthread'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+if preload_app:
+    # Model phải được nạp xong trong master trước khi fork (không dùng thread nền trong master);
+    # warm-up chạy riêng trong từng worker ở post_fork vì JIT/kernel được khởi tạo theo tiến trình
+    os.environ.setdefault('MODEL_LOAD_MODE', 'eager')
+
+from config import Config  # noqa: E402 (Config đọc MODEL_LOAD_MODE khi import)
+
+# Số thread phải lớn hơn ADMISSION_MAX_CONCURRENT thì hàng đợi của admission control mới chứa được request
+# (và trả 503 + Retry-After khi đầy); thêm vài thread để /healthz, /metrics vẫn trả lời khi quá tải.
+# Mỗi phiên WebSocket cũng giữ một thread trong suốt phiên.
+if Config.ADMISSION_ENABLED:
+    default_threads = Config.ADMISSION_MAX_CONCURRENT + Config.ADMISSION_MAX_QUEUE + 2
+else:
+    default_threads = 4
+threads = int(os.getenv('GUNICORN_THREADS', default_threads))
+
+
+def when_ready(server):
+    # Đóng băng các object đã tạo trong master để GC của worker không chạm vào (tránh copy-on-write)
+    gc.freeze()
+
+    if server.cfg.preload_app:
+        from app import start_background_workers
+        start_background_workers()
+    else:
+        # Không import app trong master: app.py sẽ nạp Whisper ngay tại đây
+        from utils.job_worker import start_standalone_job_workers
+        start_standalone_job_workers(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance'))
+
+
+def post_fork(server, worker):
+    import torch
+
+    num_threads = Config.TORCH_NUM_THREADS_PER_WORKER
+    if num_threads <= 0:
+        # Chia đều số core cho các worker để không tranh chấp CPU
+        num_threads = max(1, multiprocessing.cpu_count() // max(1, server.cfg.workers))
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Không đặt lại được khi master đã chạy tác vụ song song của torch
+        pass
+
+    logging.getLogger(__name__).info(f"Worker {worker.pid} using {num_threads} torch threads.")
+
+    if server.cfg.preload_app:
+        from app import app, whisper
+        from models.api_key import db
+
+        # Master đã dùng DB (create_all, cache kết quả): bỏ các kết nối kế thừa trong pool,
+        # worker sẽ mở kết nối riêng của mình
+        with app.app_context():
+            db.engine.dispose()
+
+        # /readyz của worker trả 503 cho đến khi warm-up xong
+        whisper.start_background()
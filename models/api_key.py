@@ -14,3 +14,28 @@ class APIKey(db.Model):
 
     def __repr__(self):
         return f'<APIKey {self.key} owned by {self.owner}>'
+
+# Truy vấn xác thực luôn lọc theo (key, active)
+API_KEY_ACTIVE_INDEX = db.Index('ix_api_keys_key_active', APIKey.key, APIKey.active)
+
+class APIKeyUsage(db.Model):
+    """Số lượt dùng của từng API key, được cộng dồn theo lô (xem utils/api_keys.py)."""
+    __tablename__ = 'api_key_usage'
+    api_key_id = db.Column(db.Integer, db.ForeignKey('api_keys.id'), primary_key=True)
+    request_count = db.Column(db.BigInteger, nullable=False, default=0)
+    last_used_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<APIKeyUsage {self.api_key_id}: {self.request_count}>'
+
+class APIKeyRevision(db.Model):
+    """
+    Bộ đếm thay đổi API key dùng chung giữa các tiến trình (một dòng, id=1): tăng trong cùng transaction
+    khi key được tạo hoặc vô hiệu hóa, để cache xác thực của mọi worker biết cần xóa.
+    """
+    __tablename__ = 'api_key_revision'
+    id = db.Column(db.Integer, primary_key=True)
+    revision = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<APIKeyRevision {self.revision}>'
@@ -0,0 +1,65 @@
+# models/job.py
+
+import json
+import uuid
+from datetime import datetime
+
+from models.api_key import db
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+JOB_FINISHED_STATUSES = (JOB_DONE, JOB_FAILED)
+
+
+class AssessmentJob(db.Model):
+    __tablename__ = 'assessment_jobs'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = db.Column(db.String(16), nullable=False, default=JOB_QUEUED, index=True)
+    owner = db.Column(db.String(100), nullable=True)
+    audio_path = db.Column(db.String(255), nullable=False)
+    language = db.Column(db.String(16), nullable=False, default='en-US')
+    reference_text = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    worker = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def encode_reference(reference_text):
+        """Nhiều reference_text được lưu thành danh sách JSON trong cùng cột."""
+        if isinstance(reference_text, str):
+            return reference_text
+        return json.dumps(list(reference_text), ensure_ascii=False)
+
+    @property
+    def reference(self):
+        """reference_text đã giải mã: một chuỗi, hoặc danh sách nếu job được tạo với nhiều reference."""
+        if self.reference_text.startswith('['):
+            try:
+                value = json.loads(self.reference_text)
+            except ValueError:
+                return self.reference_text
+            if isinstance(value, list) and value and all(isinstance(text, str) for text in value):
+                return value
+        return self.reference_text
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if self.status == JOB_DONE and self.result:
+            data['result'] = json.loads(self.result)
+        if self.status == JOB_FAILED:
+            data['error'] = self.error
+        return data
+
+    def __repr__(self):
+        return f'<AssessmentJob {self.id} {self.status}>'
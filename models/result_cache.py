@@ -0,0 +1,16 @@
+# models/result_cache.py
+
+from datetime import datetime
+
+from models.api_key import db
+
+
+class CachedResult(db.Model):
+    __tablename__ = 'cached_results'
+    key = db.Column(db.String(64), primary_key=True)
+    model_version = db.Column(db.String(64), nullable=False, index=True)
+    result = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CachedResult {self.key} model={self.model_version}>'
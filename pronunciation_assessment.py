@@ -1,44 +1,192 @@
 # pronunciation_assessment.py
 
 import re
-import torch
-from transformers import WhisperProcessor, WhisperForConditionalGeneration
-from g2p_en import G2p
-import nltk
-import librosa
-import soundfile as sf
 import json
 import os
-from jiwer import wer, cer
 import numpy as np
-from nltk.tokenize import word_tokenize
 import logging
+import threading
+from collections import namedtuple
+from config import Config
+from utils.cache import LRUCache
+from utils.grammar import get_grammar_scorer
+from utils.pitch import extract_f0, summarize_f0_contour
+from utils.metrics import REGISTRY, LATENCY_BUCKETS, StageTimer
+from utils.alignment import align, edit_distance, word_level_errors, OP_SUBSTITUTION, OP_INSERTION, OP_DELETION
+from utils.segmentation import WHISPER_MAX_SECONDS, split_into_chunks, merge_transcripts
+from utils.vad import detect_speech
 
-
-# Tải các gói cần thiết
-nltk.download('punkt')
+# Các thư viện nặng (torch, transformers, g2p_en, librosa, jiwer, nltk) chỉ được import khi
+# bước tương ứng chạy lần đầu, để import module (và khởi động app) không phải trả chi phí đó.
 
 # Thiết lập logger
 logger = logging.getLogger(__name__)
 
-from textblob import TextBlob
-
-def get_grammar_errors_and_grammar_scores(text):
-    blob = TextBlob(text)
-    corrected_blob = blob.correct()
-    original_words = blob.words
-    corrected_words = corrected_blob.words
-    total_words = len(original_words)
-    
-    grammar_errors = sum(1 for o, c in zip(original_words, corrected_words) if o.lower() != c.lower())
-    if total_words == 0:
-        grammar_score = 0.0
-    else:
-        grammar_score = ((total_words - grammar_errors) / total_words) * 100
-    return grammar_errors, grammar_score
+# Tần số lấy mẫu mà Whisper yêu cầu
+SAMPLING_RATE = 16000
+
+# Metric theo từng bước của pipeline
+STAGE_SECONDS = REGISTRY.histogram(
+    'assessment_stage_seconds', 'Time spent in each pronunciation assessment stage.',
+    buckets=LATENCY_BUCKETS, labelnames=('stage',)
+)
+PIPELINE_ERRORS = REGISTRY.counter('assessment_pipeline_errors_total', 'Pronunciation assessments that raised an error.')
+TRIMMED_SECONDS = REGISTRY.histogram(
+    'assessment_trimmed_audio_seconds', 'Leading/trailing silence removed before Whisper (audio not transcribed).',
+    buckets=LATENCY_BUCKETS
+)
+NO_SPEECH = REGISTRY.counter('assessment_no_speech_total', 'Recordings rejected early because no speech was detected.')
+
+# Dữ liệu NLTK cần cho word_tokenize: tên gói -> đường dẫn trong nltk.data
+NLTK_RESOURCES = {'punkt': 'tokenizers/punkt'}
+_nltk_ready = False
+_nltk_lock = threading.Lock()
+
+# G2p dùng chung cho toàn tiến trình (khởi tạo một lần, tránh nạp lại mô hình mỗi lần gọi)
+_g2p = None
+_g2p_lock = threading.Lock()
+
+# Kết quả tiền xử lý của reference_text: chuỗi phoneme, danh sách từ và chuỗi ký tự đã chuẩn hóa
+# phoneme_word_index[i] là chỉ số của từ chứa phoneme thứ i (dùng cho nhận xét theo từng từ)
+ReferenceEntry = namedtuple('ReferenceEntry', ['text', 'phonemes', 'words', 'chars', 'phoneme_word_index'])
+
+reference_cache = LRUCache(max_size=Config.REFERENCE_CACHE_SIZE)
+
+
+def ensure_nltk_data():
+    """
+    Kiểm tra dữ liệu NLTK đã có trên đĩa; chỉ tải về khi thiếu và Config.NLTK_AUTO_DOWNLOAD bật
+    (môi trường không có mạng nên cài sẵn dữ liệu và tắt cờ này).
+    """
+    global _nltk_ready
+    if _nltk_ready:
+        return
+    with _nltk_lock:
+        if _nltk_ready:
+            return
+        import nltk
+        for name, path in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                if not Config.NLTK_AUTO_DOWNLOAD:
+                    raise LookupError(f"NLTK resource '{name}' is missing and NLTK_AUTO_DOWNLOAD is disabled")
+                logger.info(f"Downloading NLTK resource: {name}")
+                nltk.download(name, quiet=True)
+        _nltk_ready = True
+
+
+def get_g2p():
+    global _g2p
+    if _g2p is None:
+        with _g2p_lock:
+            if _g2p is None:
+                from g2p_en import G2p
+                _g2p = G2p()
+    return _g2p
+
+
+def preprocess_text(text):
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    return text
+
+
+def text_to_phonemes(text):
+    phonemes = get_g2p()(text)
+    phonemes = [p for p in phonemes if p != ' ']
+    return phonemes
+
+
+def text_to_word_phonemes(text):
+    """Phoneme của từng từ. G2p ngăn cách các từ bằng ' ' nên chỉ cần chạy G2p một lần cho cả câu."""
+    words = text.split()
+    groups = []
+    current = []
+    for p in get_g2p()(text):
+        if p == ' ':
+            if current:
+                groups.append(current)
+                current = []
+        else:
+            current.append(p)
+    if current:
+        groups.append(current)
+
+    if len(groups) != len(words):
+        # G2p tách từ khác với split() (ví dụ từ không có ký tự Latin), nên chạy G2p cho từng từ
+        groups = [text_to_phonemes(word) for word in words]
+    return groups
+
+
+def _build_reference_entry(reference_processed):
+    words = tuple(reference_processed.split())
+    word_phonemes = text_to_word_phonemes(reference_processed)
+    return ReferenceEntry(
+        text=reference_processed,
+        phonemes=tuple(p for group in word_phonemes for p in group),
+        words=words,
+        chars=' '.join(words),
+        phoneme_word_index=tuple(i for i, group in enumerate(word_phonemes) for _ in group)
+    )
+
+
+def get_reference_entry(reference_text):
+    """Lấy (hoặc tính và lưu vào cache) phoneme và dạng chuẩn hóa của reference_text."""
+    reference_processed = preprocess_text(reference_text)
+    return reference_cache.get_or_compute(reference_processed, _build_reference_entry)
+
+
+def load_prompt_bank(path):
+    """
+    Đọc ngân hàng câu mẫu: mỗi dòng là một câu, hoặc một object JSON có khóa 'reference_text'.
+    """
+    prompts = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                line = json.loads(line).get('reference_text', '')
+            if line:
+                prompts.append(line)
+    return prompts
+
+
+def warm_reference_cache(path):
+    """Nạp trước phoneme của toàn bộ câu mẫu vào cache. Trả về số câu đã xử lý."""
+    prompts = load_prompt_bank(path)
+    for prompt in prompts:
+        get_reference_entry(prompt)
+    logger.info(f"Reference cache warmed with {len(prompts)} prompts from {path}")
+    return len(prompts)
+
+def _grammar_backend_options(name):
+    if name == 'vocabulary':
+        return {'vocabulary_path': Config.GRAMMAR_VOCABULARY_FILE, 'cache_size': Config.GRAMMAR_WORD_CACHE_SIZE}
+    if name == 'textblob':
+        return {'cache_size': Config.GRAMMAR_WORD_CACHE_SIZE}
+    if name == 'gramformer':
+        return {
+            'use_gpu': Config.GRAMMAR_USE_GPU,
+            'num_beams': Config.GRAMFORMER_NUM_BEAMS,
+            'batch_size': Config.GRAMFORMER_BATCH_SIZE
+        }
+    return {}
+
+
+def get_grammar_errors_and_grammar_scores(text, backend=None):
+    """Chấm ngữ pháp bằng backend được chọn (mặc định theo Config.GRAMMAR_BACKEND)."""
+    name = backend or Config.GRAMMAR_BACKEND
+    scorer = get_grammar_scorer(name, **_grammar_backend_options(name))
+    return scorer.score(text)
 
 
 def lexical_diversity(text):
+    from nltk.tokenize import word_tokenize
+
+    ensure_nltk_data()
     words = word_tokenize(text)
     if len(words) == 0:
         diversity_score = 0.0
@@ -46,80 +194,290 @@ def lexical_diversity(text):
         diversity_score = (len(set(words)) / len(words)) * 100 
     return diversity_score
 
-def pronunciation_assessment_configured_with_whisper(filename, language, reference_text, processor, model, device):
+def calculate_per(transcribed_phonemes, reference_phonemes, distance=None):
+    if distance is None:
+        distance = edit_distance(reference_phonemes, transcribed_phonemes)
+    max_length = max(len(transcribed_phonemes), len(reference_phonemes))
+    if max_length == 0:
+        phoneme_error_rate_ = 0.0
+    else:
+        phoneme_error_rate = distance / max_length
+        phoneme_error_rate_ = (1 - phoneme_error_rate) * 100  
+    return phoneme_error_rate_
+
+def build_word_feedback(reference_entry, alignment):
+    """Nhận xét phát âm theo từng từ của reference_text từ kết quả căn chỉnh phoneme."""
+    errors = word_level_errors(alignment, reference_entry.phoneme_word_index, len(reference_entry.words))
+    feedback = []
+    for word, word_errors in zip(reference_entry.words, errors):
+        total_errors = word_errors[OP_SUBSTITUTION] + word_errors[OP_INSERTION] + word_errors[OP_DELETION]
+        phoneme_count = word_errors['phonemes']
+        accuracy = max(0.0, 1 - total_errors / phoneme_count) * 100 if phoneme_count else 0.0
+        feedback.append({
+            'Word': word,
+            'AccuracyScore': float(accuracy),
+            'Substitutions': word_errors[OP_SUBSTITUTION],
+            'Insertions': word_errors[OP_INSERTION],
+            'Deletions': word_errors[OP_DELETION]
+        })
+    return feedback
+
+def calculate_wer_cer(transcription, reference):
+    from jiwer import wer, cer
+
+    wer_score = wer(reference, transcription) * 100
+    cer_score = cer(reference, transcription) * 100
+    return wer_score, cer_score
+
+def decode_audio(source, sampling_rate=SAMPLING_RATE):
+    """
+    Giải mã và resample âm thanh đúng một lần thành buffer float32 mono.
+    Buffer này được dùng chung cho Whisper, phân tích cao độ và các đặc trưng âm học khác.
+    """
+    import librosa
+
+    speech_array, sr = librosa.load(source, sr=sampling_rate, mono=True)
+    return np.ascontiguousarray(speech_array, dtype=np.float32), sr
+
+def analyze_pitch_contour(speech_array, sampling_rate, engine=None):
+    """Đường F0 (Praat hoặc YIN) của buffer đã giải mã và bản tóm tắt của nó."""
+    times, f0 = extract_f0(
+        speech_array,
+        sampling_rate,
+        engine=engine or Config.PITCH_ENGINE,
+        pitch_floor=Config.PITCH_FLOOR,
+        pitch_ceiling=Config.PITCH_CEILING
+    )
+    return summarize_f0_contour(times, f0)
+
+def analyze_intonation(speech_array, sampling_rate):
+    """Cao độ trung bình (F0, Hz) trên các khung hữu thanh."""
+    return analyze_pitch_contour(speech_array, sampling_rate)['MeanF0']
+
+def reference_text_list(reference_text):
+    """reference_text là một chuỗi, hoặc danh sách các đáp án được chấp nhận (cách diễn đạt khác, chính tả Anh/Mỹ)."""
+    if isinstance(reference_text, str):
+        return [reference_text]
+    return list(reference_text)
+
+def reference_score(reference_text, phoneme_error_rate, wer_score, cer_score):
+    """Điểm của transcription so với một reference (các điểm không phụ thuộc reference được tính chung)."""
+    return {
+        'ReferenceText': reference_text,
+        'AccuracyScore': float(phoneme_error_rate),
+        'FluencyScore': float(max(0.0, 100.0 - wer_score)),
+        'CompletenessScore': float(max(0.0, 100.0 - cer_score)),
+        'PronScore': float(phoneme_error_rate)
+    }
+
+def best_reference_index(scores):
+    """Reference khớp nhất: AccuracyScore (PER) cao nhất, hòa thì FluencyScore (WER) cao hơn, rồi đến thứ tự gửi lên."""
+    return max(range(len(scores)), key=lambda i: (scores[i]['AccuracyScore'], scores[i]['FluencyScore'], -i))
+
+def add_multi_reference_scores(result, scores, best):
+    """Khi gửi nhiều reference: kèm reference khớp nhất và điểm theo từng reference."""
+    result['ReferenceText'] = scores[best]['ReferenceText']
+    result['BestReferenceIndex'] = best
+    result['ReferenceScores'] = scores
+    return result
+
+def find_speech_region(speech_array, sampling_rate):
+    """Vùng có tiếng nói theo cấu hình VAD_* trong Config (None nếu bản ghi không có tiếng nói)."""
+    return detect_speech(
+        speech_array,
+        sampling_rate,
+        top_db=Config.VAD_TOP_DB,
+        floor_db=Config.VAD_FLOOR_DB,
+        min_speech_seconds=Config.VAD_MIN_SPEECH_SECONDS,
+        padding_seconds=Config.VAD_PADDING_SECONDS
+    )
+
+def speech_timing(region, sampling_rate, duration):
+    """Khối 'Speech' của kết quả: thời điểm bắt đầu/kết thúc nói (giây) để chấm độ trôi chảy."""
+    if region is None:
+        return {
+            'NoSpeech': True,
+            'SpeechStart': None,
+            'SpeechEnd': None,
+            'AudioDuration': float(duration),
+            'TrimmedSeconds': float(duration)
+        }
+    start, end = region.start / sampling_rate, region.end / sampling_rate
+    return {
+        'NoSpeech': False,
+        'SpeechStart': float(start),
+        'SpeechEnd': float(end),
+        'AudioDuration': float(duration),
+        'TrimmedSeconds': float(duration - (end - start))
+    }
+
+def no_speech_result(reference_text, speech):
+    """Kết quả cho bản ghi không có tiếng nói: đủ các khối như bình thường, mọi điểm bằng 0, không chạy Whisper."""
+    references = reference_text_list(reference_text)
+    reference_entry = get_reference_entry(references[0])
+    alignment = align(list(reference_entry.phonemes), [])
+    result = {
+        'PronunciationAssessment': {
+            'AccuracyScore': 0.0,
+            'FluencyScore': 0.0,
+            'ProsodyScore': 0.0,
+            'CompletenessScore': 0.0,
+            'PronScore': 0.0,
+            'Intonation': 0.0
+        },
+        'GrammarAssessment': {
+            'GrammarErrors': 0,
+            'GrammarScore': 0.0
+        },
+        'LexicalDiversity': 0.0,
+        'IntonationContour': summarize_f0_contour(np.array([]), np.array([])),
+        'WordFeedback': build_word_feedback(reference_entry, alignment),
+        'Speech': speech
+    }
+    if not isinstance(reference_text, str):
+        add_multi_reference_scores(result, [reference_score(text, 0.0, 100.0, 100.0) for text in references], 0)
+    return result
+
+def load_whisper_model(model_dir, backend=None):
+    """
+    Tải processor và backend suy luận Whisper (theo Config.WHISPER_BACKEND nếu không chỉ định).
+    Trả về (processor, model, device); `model` là một WhisperBackend có phương thức generate.
+    """
+    from transformers import WhisperProcessor
+    from utils.whisper_backends import create_whisper_backend
+
+    backend = backend or Config.WHISPER_BACKEND
+    options = {'onnx_dir': Config.WHISPER_ONNX_DIR} if backend == 'onnx' else {}
+    processor = WhisperProcessor.from_pretrained(model_dir)
+    model = create_whisper_backend(backend, model_dir, **options)
+    logger.info(f"Whisper backend loaded: {model}")
+    return processor, model, model.device
+
+def transcribe_features(input_features, processor, model, device, batcher=None):
+    """Chuyển input_features thành danh sách transcription, qua batcher nếu có."""
+    if batcher is not None:
+        return batcher.transcribe(input_features)
+
+    predicted_ids = model.generate(input_features)
+    return processor.batch_decode(predicted_ids, skip_special_tokens=True)
+
+def transcribe_long_audio(speech_array, sampling_rate, processor, model, device, batcher=None, timer=None):
+    """
+    Chép lời âm thanh dài hơn 30 giây: chia đoạn tại khoảng lặng, chép lời theo từng nhóm
+    LONG_AUDIO_BATCH_SIZE đoạn trong một lần generate rồi ghép lại. Bộ nhớ cho features
+    chỉ phụ thuộc vào kích thước nhóm, không phụ thuộc độ dài âm thanh.
+    """
+    timer = timer or StageTimer(STAGE_SECONDS)
+    chunks = split_into_chunks(
+        speech_array,
+        sampling_rate,
+        max_chunk_seconds=Config.LONG_AUDIO_MAX_CHUNK_SECONDS,
+        overlap_seconds=Config.LONG_AUDIO_OVERLAP_SECONDS
+    )
+    logger.info(f"Long audio split into {len(chunks)} chunks.")
+
+    group_size = max(1, Config.LONG_AUDIO_BATCH_SIZE)
+    texts = []
+    for i in range(0, len(chunks), group_size):
+        group = [speech_array[start:end] for start, end, _ in chunks[i:i + group_size]]
+        with timer.stage('feature_extraction'):
+            input_features = processor(group, sampling_rate=sampling_rate, return_tensors="pt").input_features
+        with timer.stage('generate'):
+            texts.extend(transcribe_features(input_features, processor, model, device, batcher=batcher))
+
+    return merge_transcripts(texts, [overlaps for _, _, overlaps in chunks])
+
+def pronunciation_assessment_configured_with_whisper(filename, language, reference_text, processor, model, device, batcher=None, timer=None, speech_array=None):
+    """
+    Đánh giá phát âm cho một tệp âm thanh. Nếu truyền `timer` (StageTimer), thời gian của từng bước
+    được ghi vào timer.timings; mọi bước đều được ghi vào histogram assessment_stage_seconds.
+    Nếu đã có buffer float32 16 kHz (ví dụ từ WebSocket) thì truyền qua `speech_array` để bỏ qua bước giải mã.
+    `reference_text` có thể là danh sách: Whisper và G2p của transcription chỉ chạy một lần, mọi reference
+    được chấm trên cùng transcription; kết quả theo reference khớp nhất, kèm ReferenceScores của từng reference.
+    """
     logger.info(f"Starting pronunciation assessment for file: {filename}")
+    timer = timer or StageTimer(STAGE_SECONDS)
     try:
-        def preprocess_text(text):
-            text = text.lower()
-            text = re.sub(r'[^\w\s]', '', text)
-            return text
-
-        def text_to_phonemes(text):
-            g2p = G2p()
-            phonemes = g2p(text)
-            phonemes = [p for p in phonemes if p != ' ']
-            return phonemes
-
-        def calculate_per(transcribed_phonemes, reference_phonemes):
-            distance = nltk.edit_distance(transcribed_phonemes, reference_phonemes)
-            max_length = max(len(transcribed_phonemes), len(reference_phonemes))
-            if max_length == 0:
-                phoneme_error_rate_ = 0.0
-            else:
-                phoneme_error_rate = distance / max_length
-                phoneme_error_rate_ = (1 - phoneme_error_rate) * 100  
-            return phoneme_error_rate_
-
-        def calculate_wer_cer(transcription, reference):
-            wer_score = wer(reference, transcription) * 100
-            cer_score = cer(reference, transcription) * 100
-            return wer_score, cer_score
-
-        def analyze_intonation(filename, sampling_rate):
-            y, sr = librosa.load(filename, sr=sampling_rate)
-            pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-            pitches = pitches[magnitudes > np.median(magnitudes)]
-            if len(pitches) == 0:
-                return 0.0
-            average_pitch = np.mean(pitches)
-            return float(average_pitch)
-
-        # Load and process audio
-        logger.info(f"Loading audio file: {filename}")
-        speech_array, sampling_rate = librosa.load(filename, sr=16000)
-        duration = librosa.get_duration(y=speech_array, sr=sampling_rate)
+        # Load and process audio (decoded once, shared by every stage below)
+        if speech_array is None:
+            logger.info(f"Loading audio file: {filename}")
+            with timer.stage('decode'):
+                speech_array, sampling_rate = decode_audio(filename, SAMPLING_RATE)
+        else:
+            sampling_rate = SAMPLING_RATE
+        duration = len(speech_array) / sampling_rate
         logger.info(f"Audio duration: {duration:.2f} seconds")
 
-        # Process the entire audio file without segmentation
-        logger.info("Processing entire audio file without segmentation.")
+        # Trim leading/trailing silence; silent recordings never reach Whisper
+        voiced_array = speech_array
+        speech = None
+        if Config.VAD_ENABLED:
+            with timer.stage('vad'):
+                region = find_speech_region(speech_array, sampling_rate)
+            speech = speech_timing(region, sampling_rate, duration)
+            TRIMMED_SECONDS.observe(speech['TrimmedSeconds'])
+            if region is None:
+                logger.info("No speech detected, skipping transcription.")
+                NO_SPEECH.inc()
+                return no_speech_result(reference_text, speech)
+            voiced_array = speech_array[region.start:region.end]
+            logger.info(f"Speech from {speech['SpeechStart']:.2f}s to {speech['SpeechEnd']:.2f}s "
+                        f"({speech['TrimmedSeconds']:.2f}s of silence trimmed)")
+        voiced_duration = len(voiced_array) / sampling_rate
 
-        # Transcribe the entire audio
-        input_features = processor(speech_array, sampling_rate=16000, return_tensors="pt").input_features
-        input_features = input_features.to(device)
-
-        with torch.no_grad():
-            predicted_ids = model.generate(input_features)
-        transcription = processor.batch_decode(predicted_ids, skip_special_tokens=True)[0]
+        if voiced_duration > WHISPER_MAX_SECONDS and Config.LONG_AUDIO_CHUNKING:
+            # Whisper truncates input at 30 s, so long answers are transcribed in chunks
+            transcription = transcribe_long_audio(voiced_array, sampling_rate, processor, model, device, batcher=batcher, timer=timer)
+        else:
+            # Process the entire audio file without segmentation
+            logger.info("Processing entire audio file without segmentation.")
+            with timer.stage('feature_extraction'):
+                input_features = processor(voiced_array, sampling_rate=sampling_rate, return_tensors="pt").input_features
+            with timer.stage('generate'):
+                transcription = transcribe_features(input_features, processor, model, device, batcher=batcher)[0]
         transcription_processed = preprocess_text(transcription)
-        reference_processed = preprocess_text(reference_text)
 
         logger.info(f"Transcription: {transcription_processed}")
 
-        # Convert to phonemes
-        transcription_phonemes = text_to_phonemes(transcription_processed)
-        reference_phonemes = text_to_phonemes(reference_processed)
+        # Convert to phonemes once; reference phonemes come from the cache
+        references = reference_text_list(reference_text)
+        with timer.stage('g2p'):
+            reference_entries = [get_reference_entry(text) for text in references]
+            transcription_phonemes = text_to_phonemes(transcription_processed)
 
-        # Calculate PER
-        phoneme_error_rate = calculate_per(transcription_phonemes, reference_phonemes)
-        logger.info(f"Phoneme Error Rate (PER): {phoneme_error_rate:.2f}%")
+        # Calculate PER against every reference (the alignment also gives per-word feedback)
+        with timer.stage('per'):
+            alignments = []
+            phoneme_error_rates = []
+            for entry in reference_entries:
+                reference_phonemes = list(entry.phonemes)
+                phoneme_alignment = align(reference_phonemes, transcription_phonemes)
+                alignments.append(phoneme_alignment)
+                phoneme_error_rates.append(calculate_per(transcription_phonemes, reference_phonemes, distance=phoneme_alignment.distance))
 
         # Calculate WER and CER
-        wer_score, cer_score = calculate_wer_cer(transcription_processed, reference_processed)
+        with timer.stage('wer_cer'):
+            wer_cer_scores = [calculate_wer_cer(transcription_processed, entry.text) for entry in reference_entries]
+
+        reference_scores = [
+            reference_score(text, per, wer_score, cer_score)
+            for text, per, (wer_score, cer_score) in zip(references, phoneme_error_rates, wer_cer_scores)
+        ]
+        best = best_reference_index(reference_scores)
+        phoneme_error_rate = phoneme_error_rates[best]
+        wer_score, cer_score = wer_cer_scores[best]
+        with timer.stage('word_feedback'):
+            word_feedback = build_word_feedback(reference_entries[best], alignments[best])
+        if len(references) > 1:
+            logger.info(f"Best of {len(references)} references: #{best}")
+        logger.info(f"Phoneme Error Rate (PER): {phoneme_error_rate:.2f}%")
         logger.info(f"Word Error Rate (WER): {wer_score:.2f}%")
         logger.info(f"Character Error Rate (CER): {cer_score:.2f}%")
 
         # Analyze intonation
-        average_pitch = analyze_intonation(filename, 16000)
+        with timer.stage('intonation'):
+            intonation_contour = analyze_pitch_contour(speech_array, sampling_rate)
+        average_pitch = intonation_contour['MeanF0']
         logger.info(f"Average Pitch: {average_pitch:.2f} Hz")
 
         # Calculate other scores
@@ -130,8 +488,10 @@ def pronunciation_assessment_configured_with_whisper(filename, language, referen
         avg_pro_score = phoneme_error_rate  
 
         # Grammar and lexical diversity
-        grammar_errors, grammar_score = get_grammar_errors_and_grammar_scores(transcription_processed)
-        lex_diversity = lexical_diversity(transcription_processed)
+        with timer.stage('grammar'):
+            grammar_errors, grammar_score = get_grammar_errors_and_grammar_scores(transcription_processed)
+        with timer.stage('lexical_diversity'):
+            lex_diversity = lexical_diversity(transcription_processed)
         logger.info(f"Grammar Errors: {grammar_errors}")
         logger.info(f"Grammar Score: {grammar_score:.2f}%")
         logger.info(f"Lexical Diversity: {lex_diversity:.2f}%")
@@ -150,12 +510,42 @@ def pronunciation_assessment_configured_with_whisper(filename, language, referen
                 'GrammarErrors': int(grammar_errors),
                 'GrammarScore': float(grammar_score)
             },
-            'LexicalDiversity': float(lex_diversity)
+            'LexicalDiversity': float(lex_diversity),
+            'IntonationContour': intonation_contour,
+            'WordFeedback': word_feedback
         }
+        if speech is not None:
+            final_pronunciation_assessment_result['Speech'] = speech
+        if not isinstance(reference_text, str):
+            add_multi_reference_scores(final_pronunciation_assessment_result, reference_scores, best)
 
         logger.info("Pronunciation assessment completed successfully.")
         return final_pronunciation_assessment_result
 
     except Exception as e:
         logger.error(f"Exception in pronunciation_assessment_configured_with_whisper: {e}")
+        PIPELINE_ERRORS.inc()
         return {"msg": str(e)}
+
+def warm_up_pipeline(processor, model, device, seconds=1.0):
+    """
+    Chạy pipeline một lần trên âm thanh tổng hợp để nạp trước G2p, dữ liệu NLTK, backend ngữ pháp,
+    JIT của numba và kernel của model, giúp request thật đầu tiên không phải trả chi phí khởi tạo.
+    Thời gian của lần chạy này không được ghi vào histogram assessment_stage_seconds.
+    """
+    t = np.arange(int(SAMPLING_RATE * seconds), dtype=np.float32) / SAMPLING_RATE
+    speech_array = (0.1 * np.sin(2 * np.pi * 220.0 * t)).astype(np.float32)
+    timer = StageTimer()
+    results = pronunciation_assessment_configured_with_whisper(
+        filename='<warm-up>',
+        language='en-US',
+        reference_text='hello world',
+        processor=processor,
+        model=model,
+        device=device,
+        timer=timer,
+        speech_array=speech_array
+    )
+    if 'msg' in results:
+        raise RuntimeError(results['msg'])
+    return timer.timings
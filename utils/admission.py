@@ -0,0 +1,120 @@
+# utils/admission.py
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Request bị từ chối vì hết chỗ; `retry_after` (giây) dùng cho header Retry-After."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Server is over capacity ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Giới hạn số lượt suy luận chạy đồng thời. Tối đa `max_concurrent` request được chạy,
+    tối đa `max_queue` request khác được chờ trong `queue_timeout` giây; phần còn lại bị từ chối
+    ngay (queue_full) thay vì làm chậm mọi request đang chạy và làm cạn bộ nhớ.
+    Slot được trao theo thứ tự đến (FIFO): request mới không được chen trước request đang chờ.
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._condition = threading.Condition()
+        self._queue = deque()  # Vé của các request đang chờ, theo thứ tự đến
+        self._active = 0
+        self._admitted = 0
+        self._rejected = {'queue_full': 0, 'timeout': 0, 'busy': 0}
+        # Trung bình trượt của thời gian xử lý, dùng để ước lượng Retry-After
+        self._service_seconds = None
+
+    def active(self):
+        return self._active
+
+    def waiting(self):
+        return len(self._queue)
+
+    def retry_after(self):
+        """Ước lượng số giây đến khi có chỗ: (số request đang chờ + 1) lượt xử lý chia cho số slot."""
+        service_seconds = self._service_seconds or 1.0
+        return max(1, math.ceil(service_seconds * (len(self._queue) + 1) / self.max_concurrent))
+
+    def _reject(self, reason):
+        # Gọi khi đang giữ self._condition
+        self._rejected[reason] += 1
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _acquire(self, wait):
+        with self._condition:
+            if self._active < self.max_concurrent and not self._queue:
+                self._active += 1
+                self._admitted += 1
+                return
+            if not wait:
+                raise self._reject('busy')
+            if len(self._queue) >= self.max_queue:
+                raise self._reject('queue_full')
+
+            ticket = object()
+            self._queue.append(ticket)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                # Chỉ request ở đầu hàng đợi được nhận slot vừa trống
+                while self._queue[0] is not ticket or self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject('timeout')
+                    self._condition.wait(remaining)
+                self._active += 1
+                self._admitted += 1
+            finally:
+                self._queue.remove(ticket)
+                # Request kế tiếp có thể vừa lên đầu hàng đợi
+                self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, wait=True):
+        """
+        Giữ một slot trong khối with. `wait=False` từ chối ngay (busy) khi không còn slot trống, dùng cho
+        công việc có thể bỏ qua như kết quả tạm thời của WebSocket.
+        """
+        self._acquire(wait)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._condition:
+                self._active -= 1
+                if self._service_seconds is None:
+                    self._service_seconds = elapsed
+                else:
+                    self._service_seconds = 0.8 * self._service_seconds + 0.2 * elapsed
+                self._condition.notify_all()
+
+    def rejected(self, reason):
+        return self._rejected[reason]
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'active': self._active,
+                'waiting': len(self._queue),
+                'admitted': self._admitted,
+                'rejected': dict(self._rejected),
+                'avg_service_seconds': self._service_seconds
+            }
@@ -0,0 +1,106 @@
+# utils/alignment.py
+
+from collections import namedtuple
+
+import numpy as np
+
+OP_MATCH = 'match'
+OP_SUBSTITUTION = 'substitution'
+OP_INSERTION = 'insertion'
+OP_DELETION = 'deletion'
+
+# ops: danh sách (op, ref_index, hyp_index); ref_index là None với insertion, hyp_index là None với deletion
+Alignment = namedtuple('Alignment', ['distance', 'ops'])
+
+
+def encode_sequences(reference, hypothesis):
+    """Mã hóa hai chuỗi token (ví dụ phoneme) thành mảng số nguyên dùng chung một bảng mã."""
+    vocabulary = {}
+    ref_ids = np.fromiter((vocabulary.setdefault(t, len(vocabulary)) for t in reference),
+                          dtype=np.int32, count=len(reference))
+    hyp_ids = np.fromiter((vocabulary.setdefault(t, len(vocabulary)) for t in hypothesis),
+                          dtype=np.int32, count=len(hypothesis))
+    return ref_ids, hyp_ids
+
+
+def _dtype_for(n, m):
+    return np.int16 if n + m < np.iinfo(np.int16).max else np.int32
+
+
+def levenshtein_matrix(ref_ids, hyp_ids):
+    """
+    Ma trận quy hoạch động Levenshtein (n+1) x (m+1), tính từng hàng bằng NumPy.
+
+    Trong một hàng, phép insertion phụ thuộc vào ô bên trái nên không vector hóa trực tiếp được;
+    ta dùng đẳng thức d[i][j] = j + min_{k<=j}(c[k] - k), với c là giá trị tốt nhất từ
+    substitution/deletion, và tính bằng np.minimum.accumulate.
+    """
+    n, m = len(ref_ids), len(hyp_ids)
+    dtype = _dtype_for(n, m)
+    offsets = np.arange(m + 1, dtype=dtype)
+    matrix = np.empty((n + 1, m + 1), dtype=dtype)
+    matrix[0] = offsets
+    candidates = np.empty(m + 1, dtype=dtype)
+
+    for i in range(1, n + 1):
+        previous = matrix[i - 1]
+        cost = (hyp_ids != ref_ids[i - 1]).astype(dtype)
+        candidates[0] = i
+        np.minimum(previous[1:] + 1, previous[:-1] + cost, out=candidates[1:])
+        candidates -= offsets
+        np.minimum.accumulate(candidates, out=matrix[i])
+        matrix[i] += offsets
+
+    return matrix
+
+
+def edit_distance(reference, hypothesis):
+    """Khoảng cách Levenshtein giữa hai chuỗi token (cùng kết quả với nltk.edit_distance)."""
+    if len(reference) == 0 or len(hypothesis) == 0:
+        return max(len(reference), len(hypothesis))
+    ref_ids, hyp_ids = encode_sequences(reference, hypothesis)
+    return int(levenshtein_matrix(ref_ids, hyp_ids)[-1, -1])
+
+
+def align(reference, hypothesis):
+    """Căn chỉnh hai chuỗi token, trả về Alignment(distance, ops) theo thứ tự từ đầu đến cuối."""
+    ref_ids, hyp_ids = encode_sequences(reference, hypothesis)
+    matrix = levenshtein_matrix(ref_ids, hyp_ids)
+
+    ops = []
+    i, j = len(ref_ids), len(hyp_ids)
+    while i > 0 or j > 0:
+        if i > 0 and j > 0:
+            same = ref_ids[i - 1] == hyp_ids[j - 1]
+            if matrix[i, j] == matrix[i - 1, j - 1] + (0 if same else 1):
+                ops.append((OP_MATCH if same else OP_SUBSTITUTION, i - 1, j - 1))
+                i -= 1
+                j -= 1
+                continue
+        if i > 0 and matrix[i, j] == matrix[i - 1, j] + 1:
+            ops.append((OP_DELETION, i - 1, None))
+            i -= 1
+        else:
+            ops.append((OP_INSERTION, None, j - 1))
+            j -= 1
+
+    ops.reverse()
+    return Alignment(int(matrix[-1, -1]), ops)
+
+
+def word_level_errors(alignment, phoneme_word_index, word_count):
+    """
+    Gom lỗi phoneme theo từ của văn bản tham khảo. Insertion được tính cho từ của phoneme
+    tham khảo đứng trước nó (hoặc từ đầu tiên nếu nằm ở đầu câu).
+    """
+    errors = [{OP_SUBSTITUTION: 0, OP_INSERTION: 0, OP_DELETION: 0, 'phonemes': 0} for _ in range(word_count)]
+    for word in phoneme_word_index:
+        errors[word]['phonemes'] += 1
+
+    current_word = 0
+    for op, ref_index, _ in alignment.ops:
+        if ref_index is not None:
+            current_word = phoneme_word_index[ref_index]
+        if op != OP_MATCH and word_count:
+            errors[current_word][op] += 1
+    return errors
@@ -0,0 +1,172 @@
+# utils/api_keys.py
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Kết quả xác thực một API key hợp lệ
+VerifiedKey = namedtuple('VerifiedKey', ['id', 'owner'])
+
+
+def looks_like_jwt(credential):
+    """JWT có dạng header.payload.signature; API key là UUID nên không có dấu chấm."""
+    return credential.count('.') == 2
+
+
+def ensure_api_key_index():
+    """Tạo index (key, active) trên bảng đã tồn tại; db.create_all() chỉ tạo index cho bảng mới."""
+    from models.api_key import db, API_KEY_ACTIVE_INDEX
+
+    API_KEY_ACTIVE_INDEX.create(bind=db.engine, checkfirst=True)
+
+
+def bump_api_key_revision():
+    """Tăng bộ đếm thay đổi API key trong session hiện tại (người gọi commit cùng thay đổi của key)."""
+    from models.api_key import db, APIKeyRevision
+
+    updated = APIKeyRevision.query.filter_by(id=1).update(
+        {APIKeyRevision.revision: APIKeyRevision.revision + 1}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(APIKeyRevision(id=1, revision=1))
+
+
+class APIKeyVerifier:
+    """
+    Xác thực API key với cache TTL trong tiến trình: cả key hợp lệ lẫn key không tồn tại/đã vô hiệu hóa
+    đều được cache, nên request thường không chạm tới DB. Khi tạo hoặc vô hiệu hóa key, endpoint tăng
+    bộ đếm dùng chung (bump_api_key_revision) và gọi invalidate() để tiến trình hiện tại thấy ngay.
+    Mỗi tiến trình đọc bộ đếm (một dòng theo khóa chính) tối đa mỗi `revision_check_seconds` giây và xóa
+    toàn bộ cache khi bộ đếm đổi, nên các worker khác thấy thay đổi sau tối đa chừng đó thời gian
+    (0 = kiểm tra ở mọi request) thay vì sau `ttl_seconds`.
+
+    Số lượt dùng của từng key được cộng dồn trong bộ nhớ và ghi xuống bảng api_key_usage theo lô
+    bởi một thread nền (mỗi `flush_interval` giây), thay vì ghi DB ở mỗi request.
+    """
+
+    def __init__(self, app=None, ttl_seconds=60, negative_ttl_seconds=10, max_entries=10000, flush_interval=10,
+                 revision_check_seconds=1.0):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.revision_check_seconds = revision_check_seconds
+        self._revision = None
+        self._revision_checked_at = None
+        self._revision_lock = threading.Lock()
+        self.flush_interval = flush_interval
+        self._cache = LRUCache(max_size=max_entries)
+        self._usage_lock = threading.Lock()
+        self._pending_usage = {}
+        self._last_used = {}
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self.flush_usage)
+
+    def verify(self, key):
+        """Trả về VerifiedKey nếu key đang hoạt động, ngược lại None."""
+        now = time.monotonic()
+        self._sync_revision(now)
+        entry = self._cache.get(key)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        from models.api_key import APIKey
+
+        record = APIKey.query.filter_by(key=key, active=True).first()
+        verified = VerifiedKey(record.id, record.owner) if record is not None else None
+        ttl = self.ttl_seconds if verified is not None else self.negative_ttl_seconds
+        self._cache.put(key, (verified, now + ttl))
+        return verified
+
+    def _sync_revision(self, now):
+        # Đọc bộ đếm dùng chung; nếu tiến trình khác đã tạo/vô hiệu hóa key thì bỏ toàn bộ cache
+        if self._revision_checked_at is not None and now - self._revision_checked_at < self.revision_check_seconds:
+            return
+        with self._revision_lock:
+            if self._revision_checked_at is not None and now - self._revision_checked_at < self.revision_check_seconds:
+                return
+            from models.api_key import APIKeyRevision
+
+            row = APIKeyRevision.query.filter_by(id=1).first()
+            revision = row.revision if row is not None else 0
+            if revision != self._revision:
+                if self._revision is not None:
+                    logger.info(f"API keys changed (revision {self._revision} -> {revision}), clearing cache.")
+                self._cache.clear()
+                self._revision = revision
+            self._revision_checked_at = now
+
+    def invalidate(self, key):
+        """Bỏ key khỏi cache (gọi khi tạo mới hoặc vô hiệu hóa key)."""
+        self._cache.put(key, (None, 0.0))
+
+    def record_usage(self, verified):
+        with self._usage_lock:
+            self._pending_usage[verified.id] = self._pending_usage.get(verified.id, 0) + 1
+            self._last_used[verified.id] = datetime.utcnow()
+        self._ensure_flusher()
+
+    def flush_usage(self):
+        """Ghi các lượt dùng đang chờ xuống DB trong một transaction."""
+        with self._usage_lock:
+            pending, self._pending_usage = self._pending_usage, {}
+            last_used, self._last_used = self._last_used, {}
+        if not pending or self.app is None:
+            return 0
+
+        from models.api_key import db, APIKeyUsage
+
+        try:
+            with self.app.app_context():
+                for key_id, count in pending.items():
+                    updated = APIKeyUsage.query.filter_by(api_key_id=key_id).update({
+                        APIKeyUsage.request_count: APIKeyUsage.request_count + count,
+                        APIKeyUsage.last_used_at: last_used[key_id]
+                    }, synchronize_session=False)
+                    if not updated:
+                        db.session.add(APIKeyUsage(api_key_id=key_id, request_count=count, last_used_at=last_used[key_id]))
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error flushing API key usage: {e}")
+            # Trả lại số lượt chưa ghi được để lần flush sau thử lại
+            with self._usage_lock:
+                for key_id, count in pending.items():
+                    self._pending_usage[key_id] = self._pending_usage.get(key_id, 0) + count
+                    self._last_used.setdefault(key_id, last_used[key_id])
+            return 0
+        return sum(pending.values())
+
+    def stats(self):
+        with self._usage_lock:
+            pending = sum(self._pending_usage.values())
+        stats = self._cache.stats()
+        stats['pending_usage'] = pending
+        return stats
+
+    def _ensure_flusher(self):
+        # Thread không tồn tại sau fork (worker gunicorn), nên khởi động theo PID
+        if self._flusher_pid == os.getpid():
+            return
+        with self._flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            threading.Thread(target=self._flush_loop, name='api-key-usage-flusher', daemon=True).start()
+            self._flusher_pid = os.getpid()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush_usage()
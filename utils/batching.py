@@ -0,0 +1,138 @@
+# utils/batching.py
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class WhisperBatcher:
+    """
+    Gom input_features từ nhiều request đồng thời thành một batch và chạy một lần model.generate.
+
+    Mỗi request gửi features của mình vào hàng đợi; thread nền chờ tối đa `max_wait_ms`
+    hoặc đến khi đủ `max_batch_size` mẫu, pad các features về cùng độ dài, gọi generate
+    rồi trả transcription về đúng Future của từng request.
+    """
+
+    def __init__(self, processor, model, device, max_batch_size=8, max_wait_ms=20):
+        self.processor = processor
+        self.model = model
+        self.device = device
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(QUEUE_WAIT_BUCKETS)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Thread không tồn tại sau fork (ví dụ gunicorn --preload), nên khởi động lười theo PID
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='whisper-batcher', daemon=True)
+                self._thread.start()
+                logger.info(
+                    f"Whisper batcher started (max_batch_size={self.max_batch_size}, "
+                    f"max_wait={self.max_wait * 1000:.0f}ms)"
+                )
+
+    def submit(self, input_features):
+        """
+        Gửi input_features dạng (n, n_mels, frames) vào hàng đợi.
+        Trả về Future chứa danh sách n transcription.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((input_features, future, time.monotonic()))
+        return future
+
+    def transcribe(self, input_features, timeout=None):
+        return self.submit(input_features).result(timeout=timeout)
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self.queue_depth(),
+            'batch_size': self.batch_size_histogram.snapshot(),
+            'queue_wait_seconds': self.queue_wait_histogram.snapshot()
+        }
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        rows = first[0].shape[0]
+        deadline = time.monotonic() + self.max_wait
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += item[0].shape[0]
+
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            started = time.monotonic()
+            for _, _, enqueued_at in batch:
+                self.queue_wait_histogram.observe(started - enqueued_at)
+            self.batch_size_histogram.observe(rows)
+
+            try:
+                transcriptions = self._generate([features for features, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Error in batched Whisper generate: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for features, future, _ in batch:
+                count = features.shape[0]
+                future.set_result(transcriptions[offset:offset + count])
+                offset += count
+
+            logger.debug(f"Batched generate: {rows} samples in {time.monotonic() - started:.3f}s")
+
+    def _generate(self, features_list):
+        # Pad theo trục thời gian về độ dài lớn nhất trong batch
+        max_frames = max(features.shape[-1] for features in features_list)
+        padded = [
+            torch.nn.functional.pad(features, (0, max_frames - features.shape[-1]))
+            if features.shape[-1] < max_frames else features
+            for features in features_list
+        ]
+        input_features = torch.cat(padded, dim=0)
+
+        predicted_ids = self.model.generate(input_features)
+        return self.processor.batch_decode(predicted_ids, skip_special_tokens=True)
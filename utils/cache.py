@@ -0,0 +1,70 @@
+# utils/cache.py
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache LRU có giới hạn kích thước, an toàn khi dùng từ nhiều thread, có đếm hit/miss.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max(0, int(max_size))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def get_or_compute(self, key, compute):
+        """Lấy giá trị từ cache, nếu chưa có thì tính bằng `compute(key)` rồi lưu lại."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            # Tính ngoài lock để không chặn các thread khác
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0
+            }
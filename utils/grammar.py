@@ -0,0 +1,243 @@
+# utils/grammar.py
+
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize_words(text):
+    return _WORD_RE.findall(text.lower())
+
+
+def _skip_word(word):
+    # Giống TextBlob: không sửa từ một ký tự và số
+    return len(word) <= 1 or word.replace('.', '').isdigit()
+
+
+def _score(total_words, grammar_errors):
+    if total_words == 0:
+        return 0.0
+    return ((total_words - grammar_errors) / total_words) * 100
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+_ALPHABET = 'abcdefghijklmnopqrstuvwxyz'  # Spelling.ALPHA của TextBlob
+
+
+def _edits1(word):
+    """Các chuỗi cách `word` đúng một phép sửa (xóa, đảo, thay, chèn) - giống Spelling._edit1 của TextBlob."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    edits = {a + b[1:] for a, b in splits if b}
+    edits.update(a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1)
+    edits.update(a + c + b[1:] for a, b in splits if b for c in _ALPHABET)
+    edits.update(a + c + b for a, b in splits for c in _ALPHABET)
+    return edits
+
+
+def default_vocabulary_path():
+    """Đường dẫn tệp tần suất từ mà TextBlob dùng cho bộ sửa chính tả."""
+    import textblob
+    return os.path.join(os.path.dirname(textblob.__file__), 'en', 'en-spelling.txt')
+
+
+def load_vocabulary(path):
+    """Đọc tệp từ vựng: mỗi dòng là một từ (có thể kèm tần suất), bỏ qua dòng chú thích ';;;'."""
+    vocabulary = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith(';;;'):
+                continue
+            vocabulary.add(line.split()[0].lower())
+    return vocabulary
+
+
+class GrammarScorer:
+    """
+    Giao diện chung cho các backend chấm ngữ pháp. score(text) trả về (grammar_errors, grammar_score).
+    """
+
+    name = None
+
+    def score(self, text):
+        raise NotImplementedError
+
+    def clear_cache(self):
+        """Xóa kết quả đã ghi nhớ theo từ (nếu backend có)."""
+
+
+class VocabularyGrammarScorer(GrammarScorer):
+    """
+    Backend mặc định, nhanh: một từ bị tính là lỗi khi không có trong từ vựng nhưng có từ cách nó
+    tối đa hai phép sửa - cùng tiêu chí TextBlob.correct dùng để đổi một từ, nên số lỗi giống backend
+    'textblob'. Chỉ mục các chuỗi bị xóa một ký tự loại nhanh phần lớn chuỗi không có từ nào ở khoảng
+    cách 1, chỉ các chuỗi còn lại mới được kiểm tra bằng edits1; khoảng cách 2 được xét bằng cách
+    kiểm tra khoảng cách 1 cho từng chuỗi trong edits1 của từ, không sinh toàn bộ edits2 như TextBlob.
+    Kết quả được ghi nhớ theo từng từ.
+    """
+
+    name = 'vocabulary'
+
+    def __init__(self, vocabulary_path=None, cache_size=65536):
+        self.vocabulary_path = vocabulary_path or default_vocabulary_path()
+        self._vocabulary = None
+        self._delete_index = None
+        self._lock = threading.Lock()
+        self.is_error = lru_cache(maxsize=cache_size)(self._is_error)
+
+    def _ensure_loaded(self):
+        if self._vocabulary is not None:
+            return
+        with self._lock:
+            if self._vocabulary is None:
+                vocabulary = load_vocabulary(self.vocabulary_path)
+                delete_index = set()
+                for word in vocabulary:
+                    delete_index.update(_deletes(word))
+                self._delete_index = delete_index
+                self._vocabulary = vocabulary
+                logger.info(f"Grammar vocabulary loaded: {len(vocabulary)} words from {self.vocabulary_path}")
+
+    def _may_have_close_word(self, word):
+        # Lọc nhanh bằng chỉ mục: không bỏ sót từ nào ở khoảng cách 1, nhưng vế cuối cũng khớp
+        # một số cặp cách nhau hai phép sửa (ví dụ 'abc' và 'bca'), nên cần kiểm tra lại
+        deletes = _deletes(word)
+        return (
+            any(d in self._vocabulary for d in deletes)          # thừa một ký tự
+            or word in self._delete_index                         # thiếu một ký tự
+            or any(d in self._delete_index for d in deletes)      # sai hoặc đảo một ký tự
+        )
+
+    def _has_close_word(self, word):
+        return self._may_have_close_word(word) and any(edit in self._vocabulary for edit in _edits1(word))
+
+    def _is_error(self, word):
+        if _skip_word(word) or word in self._vocabulary:
+            return False
+        return self._has_close_word(word) or any(self._has_close_word(edit) for edit in _edits1(word))
+
+    def clear_cache(self):
+        self.is_error.cache_clear()
+
+    def score(self, text):
+        self._ensure_loaded()
+        words = tokenize_words(text)
+        grammar_errors = sum(1 for word in words if self.is_error(word))
+        return grammar_errors, _score(len(words), grammar_errors)
+
+
+class TextBlobGrammarScorer(GrammarScorer):
+    """
+    Backend dùng bộ sửa chính tả của TextBlob, sửa từng từ (có ghi nhớ) nên không bị lệch vị trí
+    khi số từ thay đổi.
+    """
+
+    name = 'textblob'
+
+    def __init__(self, cache_size=65536):
+        self.correct_word = lru_cache(maxsize=cache_size)(self._correct_word)
+
+    @staticmethod
+    def _correct_word(word):
+        from textblob import Word
+        return str(Word(word).correct())
+
+    def clear_cache(self):
+        self.correct_word.cache_clear()
+
+    def score(self, text):
+        words = tokenize_words(text)
+        grammar_errors = sum(1 for word in words if self.correct_word(word).lower() != word)
+        return grammar_errors, _score(len(words), grammar_errors)
+
+
+class GramformerGrammarScorer(GrammarScorer):
+    """
+    Backend chất lượng cao (tùy chọn) dùng Gramformer: sửa câu bằng mô hình seq2seq rồi đếm
+    số từ bị ERRANT đánh dấu là lỗi. Chậm hơn nhiều so với backend mặc định.
+    """
+
+    name = 'gramformer'
+
+    def __init__(self, use_gpu=False, max_words_per_segment=40, num_beams=1, batch_size=16):
+        self.use_gpu = use_gpu
+        self.max_words_per_segment = max_words_per_segment
+        self.num_beams = num_beams
+        self.batch_size = batch_size
+        self._gramformer = None
+        self._lock = threading.Lock()
+
+    def _get_gramformer(self):
+        if self._gramformer is None:
+            with self._lock:
+                if self._gramformer is None:
+                    from gramformer import Gramformer
+                    self._gramformer = Gramformer(models=1, use_gpu=self.use_gpu)
+        return self._gramformer
+
+    def _segments(self, words):
+        # Transcription không có dấu câu nên được chia thành các đoạn ngắn để vừa max_length của mô hình
+        step = self.max_words_per_segment
+        return [' '.join(words[i:i + step]) for i in range(0, len(words), step)]
+
+    def score(self, text):
+        words = text.split()
+        if not words:
+            return 0, 0.0
+
+        gramformer = self._get_gramformer()
+        segments = self._segments(words)
+        # Tất cả đoạn của transcription được sửa trong một lần gọi theo batch
+        corrections = gramformer.correct_batch(
+            segments,
+            max_candidates=1,
+            num_beams=self.num_beams,
+            do_sample=False,
+            batch_size=self.batch_size
+        )
+
+        pairs = [(segment, next(iter(corrected), segment)) for segment, corrected in zip(segments, corrections)]
+
+        grammar_errors = 0
+        for edits in gramformer.get_edits_batch(pairs):
+            for edit in edits:
+                # edit = (type, o_str, o_start, o_end, c_str, c_start, c_end)
+                grammar_errors += max(edit[3] - edit[2], 1)
+
+        grammar_errors = min(grammar_errors, len(words))
+        return grammar_errors, _score(len(words), grammar_errors)
+
+
+GRAMMAR_BACKENDS = {
+    VocabularyGrammarScorer.name: VocabularyGrammarScorer,
+    TextBlobGrammarScorer.name: TextBlobGrammarScorer,
+    GramformerGrammarScorer.name: GramformerGrammarScorer
+}
+
+_scorers = {}
+_scorers_lock = threading.Lock()
+
+
+def get_grammar_scorer(name, **kwargs):
+    """Trả về backend chấm ngữ pháp theo tên (mỗi backend chỉ khởi tạo một lần cho mỗi tiến trình)."""
+    if name not in GRAMMAR_BACKENDS:
+        raise ValueError(f"Unknown grammar backend: {name}. Available: {sorted(GRAMMAR_BACKENDS)}")
+    if name not in _scorers:
+        with _scorers_lock:
+            if name not in _scorers:
+                _scorers[name] = GRAMMAR_BACKENDS[name](**kwargs)
+    return _scorers[name]
+
+
+def clear_grammar_caches():
+    """Xóa cache theo từ của mọi backend đã khởi tạo (dùng khi đo hiệu năng)."""
+    for scorer in list(_scorers.values()):
+        scorer.clear_cache()
@@ -13,38 +13,166 @@ def allowed_file(filename):
 
 # utils/helpers.py
 
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
 import os
+import queue
+
+from utils.metrics import REGISTRY
+
+# Mã request và thời gian từng bước của request hiện tại (mỗi thread/request một giá trị riêng)
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+LOG_RECORDS_DROPPED = REGISTRY.counter('log_records_dropped_total', 'Log records dropped because the logging queue was full.')
+
+# QueueListener đang chạy của tiến trình (None ở chế độ đồng bộ) cùng QueueHandler và các handler ghi thật
+_listener = None
+_queue_handler = None
+_target_handlers = ()
+
+
+class RequestContextFilter(logging.Filter):
+    """Gắn request_id vào record. Phải chạy trên thread gọi log (trước khi record vào hàng đợi)."""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler không bao giờ chặn: khi hàng đợi đầy thì bỏ record và đếm vào metric."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class JsonFormatter(logging.Formatter):
+    """Mỗi record là một dòng JSON; kèm request_id và timings (nếu truyền qua extra={'timings': ...})."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage()
+        }
+        timings = getattr(record, 'timings', None)
+        if timings:
+            entry['timings'] = timings
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_library_levels(value):
+    """'numba=WARNING,urllib3=INFO' -> {'numba': 'WARNING', 'urllib3': 'INFO'}"""
+    levels = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_listener(log_queue):
+    global _listener
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_target_handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_listener_in_child():
+    # Thread listener không tồn tại trong tiến trình con sau fork (ví dụ worker gunicorn):
+    # tạo hàng đợi và listener mới để log không bị giữ lại trong hàng đợi của master
+    if _listener is not None:
+        _start_listener(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_in_child)
+atexit.register(lambda: stop_logging())
+
+
+def stop_logging():
+    """Ghi nốt các record còn trong hàng đợi rồi dừng thread ghi log."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def create_file_handler(mode, log_file):
+    """
+    Handler ghi tệp log theo LOG_FILE_MODE. RotatingFileHandler không dùng được khi nhiều tiến trình
+    cùng ghi một tệp: mỗi tiến trình tự xoay vòng nên record bị mất hoặc lẫn sau khi xoay.
+    """
+    if mode == 'none':
+        return None
+    if mode not in ('watched', 'rotating'):
+        raise ValueError(f"Unknown LOG_FILE_MODE: {mode}. Available: ['none', 'rotating', 'watched']")
+
+    log_directory = os.path.dirname(log_file)
+    if log_directory and not os.path.exists(log_directory):
+        os.makedirs(log_directory, exist_ok=True)
+
+    if mode == 'rotating':
+        return logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=Config.LOG_MAX_BYTES, backupCount=Config.LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+    # Mở lại tệp khi logrotate đổi tên/xóa tệp cũ
+    return logging.handlers.WatchedFileHandler(log_file, encoding='utf-8')
+
 
 def setup_logging():
-    log_directory = 'logs'
-    if not os.path.exists(log_directory):
-        os.makedirs(log_directory)
-    
-    log_file = os.path.join(log_directory, 'app.log')
-    
+    global _queue_handler, _target_handlers
+
     # Tạo logger
     logger = logging.getLogger()
-    logger.setLevel(logging.DEBUG)  # Đặt mức độ log tối thiểu
-    
+    logger.setLevel(Config.LOG_LEVEL)  # Đặt mức độ log tối thiểu
+
     # Xóa các handler cũ nếu có (để tránh trùng lặp log)
+    stop_logging()
     if logger.hasHandlers():
         logger.handlers.clear()
-    
+
+    # Giảm log của các thư viện ồn ào (ví dụ numba in IR ở mức DEBUG)
+    for name, level in parse_library_levels(Config.LOG_LIBRARY_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
     # Tạo formatter
-    formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s %(threadName)s : %(message)s')
-    
-    # Tạo FileHandler để ghi log vào tệp
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)  # Đặt mức độ log cho FileHandler
-    file_handler.setFormatter(formatter)
-    
+    if Config.LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s %(threadName)s [%(request_id)s] : %(message)s')
+
     # Tạo StreamHandler để hiển thị log trên console
     stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(logging.DEBUG)  # Đặt mức độ log cho StreamHandler
     stream_handler.setFormatter(formatter)
-    
-    # Thêm các handler vào logger
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
+    handlers = [stream_handler]
+
+    file_handler = create_file_handler(Config.LOG_FILE_MODE, Config.LOG_FILE)
+    if file_handler is not None:
+        file_handler.setFormatter(formatter)
+        handlers.insert(0, file_handler)
+
+    if not Config.LOG_ASYNC:
+        for handler in handlers:
+            handler.addFilter(RequestContextFilter())
+            logger.addHandler(handler)
+        return
 
+    # Thread xử lý request chỉ đưa record vào hàng đợi; việc định dạng và ghi đĩa do QueueListener làm
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestContextFilter())
+    _target_handlers = tuple(handlers)
+    logger.addHandler(_queue_handler)
+    _start_listener(_queue_handler.queue)
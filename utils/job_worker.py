@@ -0,0 +1,209 @@
+# utils/job_worker.py
+
+import atexit
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def claim_next_job(worker_name):
+    """
+    Nhận job 'queued' cũ nhất một cách nguyên tử: chỉ một worker cập nhật được trạng thái
+    từ 'queued' sang 'running'. Trả về job hoặc None nếu hàng đợi rỗng.
+    """
+    from models.api_key import db
+    from models.job import AssessmentJob, JOB_QUEUED, JOB_RUNNING
+
+    while True:
+        candidate = db.session.query(AssessmentJob.id) \
+            .filter_by(status=JOB_QUEUED) \
+            .order_by(AssessmentJob.created_at) \
+            .first()
+        if candidate is None:
+            db.session.rollback()
+            return None
+
+        claimed = AssessmentJob.query \
+            .filter_by(id=candidate.id, status=JOB_QUEUED) \
+            .update({'status': JOB_RUNNING, 'worker': worker_name, 'started_at': datetime.utcnow()},
+                    synchronize_session=False)
+        db.session.commit()
+        if claimed == 1:
+            return AssessmentJob.query.filter_by(id=candidate.id).first()
+        # Worker khác đã nhận job này, thử job tiếp theo
+
+
+def requeue_stale_jobs():
+    """Đưa các job đang 'running' (worker đã dừng khi khởi động lại) về hàng đợi."""
+    from models.api_key import db
+    from models.job import AssessmentJob, JOB_QUEUED, JOB_RUNNING
+
+    count = AssessmentJob.query \
+        .filter_by(status=JOB_RUNNING) \
+        .update({'status': JOB_QUEUED, 'worker': None, 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+    if count:
+        logger.info(f"Requeued {count} interrupted assessment jobs.")
+    return count
+
+
+def queue_depth():
+    from models.job import AssessmentJob, JOB_QUEUED
+    return AssessmentJob.query.filter_by(status=JOB_QUEUED).count()
+
+
+def _run_job(job, processor, model, device):
+    from models.api_key import db
+    from models.job import JOB_DONE, JOB_FAILED
+    from pronunciation_assessment import pronunciation_assessment_configured_with_whisper
+    from utils.helpers import request_id_var
+
+    # Log của job mang mã job thay cho mã request
+    request_id_var.set(job.id)
+    logger.info(f"Running assessment job {job.id}")
+    try:
+        results = pronunciation_assessment_configured_with_whisper(
+            filename=job.audio_path,
+            language=job.language,
+            reference_text=job.reference,
+            processor=processor,
+            model=model,
+            device=device
+        )
+        if 'PronunciationAssessment' in results:
+            job.status = JOB_DONE
+            job.result = json.dumps(results)
+        else:
+            job.status = JOB_FAILED
+            job.error = results.get('msg', 'Unknown error')
+    except Exception as e:
+        logger.error(f"Error in assessment job {job.id}: {e}")
+        job.status = JOB_FAILED
+        job.error = str(e)
+    finally:
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        if os.path.exists(job.audio_path):
+            os.remove(job.audio_path)
+
+    logger.info(f"Assessment job {job.id} finished with status: {job.status}")
+
+
+def create_worker_app(instance_path):
+    """Flask app tối thiểu (chỉ config + DB) cho tiến trình không import app.py."""
+    from flask import Flask
+    from config import Config
+    from models.api_key import db
+
+    app = Flask(__name__, instance_path=instance_path)
+    app.config.from_object(Config)
+    db.init_app(app)
+    return app
+
+
+def run_worker(worker_name, instance_path, parent_pid=None):
+    """
+    Vòng lặp của một tiến trình worker: tải Whisper một lần rồi lần lượt xử lý các job.
+    Mỗi worker giữ một bản model riêng (ngoài bản của server). Worker tự dừng khi tiến trình
+    cha (`parent_pid`) không còn.
+    """
+    import torch
+    from config import Config
+    from models.api_key import db
+    from pronunciation_assessment import load_whisper_model
+    from utils.helpers import setup_logging
+
+    setup_logging()
+    if Config.JOB_WORKER_TORCH_THREADS > 0:
+        torch.set_num_threads(Config.JOB_WORKER_TORCH_THREADS)
+
+    app = create_worker_app(instance_path)
+
+    logger.info(f"[{worker_name}] Loading Whisper model...")
+    processor, model, device = load_whisper_model(Config.MODEL_DIR)
+    logger.info(f"[{worker_name}] Whisper model loaded, waiting for jobs.")
+
+    with app.app_context():
+        while True:
+            try:
+                job = claim_next_job(worker_name)
+            except Exception as e:
+                logger.error(f"[{worker_name}] Error claiming job: {e}")
+                db.session.rollback()
+                job = None
+
+            if job is None:
+                if parent_pid is not None and os.getppid() != parent_pid:
+                    logger.info(f"[{worker_name}] Parent process exited, stopping.")
+                    return
+                time.sleep(Config.JOB_POLL_INTERVAL)
+                continue
+
+            _run_job(job, processor, model, device)
+
+
+def start_job_workers(count, instance_path):
+    """
+    Khởi động `count` tiến trình worker bằng `python -m utils.job_worker`. Không dùng multiprocessing
+    (spawn): với `python app.py`, spawn import lại app.py trong từng worker, khiến worker nạp thêm
+    một bản Whisper, tạo lại DB, logging, limiter... trước khi vào run_worker.
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workers = []
+    for i in range(count):
+        worker_name = f"job-worker-{i}"
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'utils.job_worker', worker_name, os.path.abspath(instance_path), str(os.getpid())],
+            cwd=project_root
+        )
+        workers.append(process)
+    atexit.register(stop_job_workers, workers, owner_pid=os.getpid())
+    logger.info(f"Started {count} assessment job workers.")
+    return workers
+
+
+def stop_job_workers(workers, timeout=10, owner_pid=None):
+    # Handler atexit được kế thừa qua fork (worker gunicorn): chỉ tiến trình đã khởi động mới dừng worker
+    if owner_pid is not None and os.getpid() != owner_pid:
+        return
+    for process in workers:
+        if process.poll() is None:
+            process.terminate()
+    for process in workers:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def start_standalone_job_workers(instance_path):
+    """
+    Như start_background_workers() của app.py nhưng không import app (không nạp Whisper):
+    dùng cho master gunicorn khi không preload, để master không giữ thêm một bản model.
+    """
+    from config import Config
+    from models.api_key import db
+    import models.job  # noqa: F401 (đăng ký bảng cho db.create_all())
+    import models.result_cache  # noqa: F401
+
+    if Config.JOB_WORKERS <= 0:
+        return []
+    app = create_worker_app(instance_path)
+    with app.app_context():
+        # Master chạy trước mọi worker: với cơ sở dữ liệu mới, bảng assessment_jobs chưa tồn tại
+        db.create_all()
+        requeue_stale_jobs()
+        # Không giữ kết nối của master cho các tiến trình sẽ fork sau đó
+        db.engine.dispose()
+    return start_job_workers(Config.JOB_WORKERS, instance_path)
+
+
+if __name__ == '__main__':
+    # python -m utils.job_worker <worker_name> <instance_path> [parent_pid]
+    run_worker(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None)
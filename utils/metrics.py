@@ -0,0 +1,234 @@
+# utils/metrics.py
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """
+    Histogram đơn giản (thread-safe) với các bucket cố định, dùng cho thống kê nội bộ.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Trả về số đếm tích lũy theo từng bucket (giống định dạng Prometheus)."""
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total_count = self._count
+
+        cumulative = {}
+        running = 0
+        for upper_bound, count in zip(self.buckets, counts):
+            running += count
+            cumulative[str(upper_bound)] = running
+        cumulative['+Inf'] = total_count
+
+        return {
+            'buckets': cumulative,
+            'count': total_count,
+            'sum': total_sum
+        }
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge có thể tăng/giảm, hoặc lấy giá trị từ một hàm tại thời điểm xuất số liệu."""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = function
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return []
+            return self.header() + [f'{self.name} {_format_value(value)}']
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items
+        ]
+
+
+class HistogramMetric(_Metric):
+    """Histogram theo nhãn; có thể bọc một Histogram sẵn có (ví dụ của WhisperBatcher)."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, buckets=None, labelnames=(), histogram=None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) if buckets else (histogram.buckets if histogram else ())
+        self._histograms = {}
+        if histogram is not None:
+            self._histograms[()] = histogram
+
+    def labels(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(self.buckets)
+            return self._histograms[key]
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines = self.header()
+        for key, histogram in items:
+            snapshot = histogram.snapshot()
+            for upper_bound, count in snapshot['buckets'].items():
+                labels = _format_labels(self.labelnames, key, ('le', upper_bound))
+                lines.append(f'{self.name}_bucket{labels} {count}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(float(snapshot["sum"]))}')
+            lines.append(f'{self.name}_count{labels} {snapshot["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Tập hợp các metric của tiến trình, xuất theo định dạng văn bản của Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Đăng ký lại cùng tên (ví dụ khi module được nạp lại) trả về metric đã có
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self.register(Gauge(name, documentation, labelnames, function=function))
+
+    def histogram(self, name, documentation, buckets=None, labelnames=(), histogram=None):
+        return self.register(HistogramMetric(name, documentation, buckets, labelnames, histogram=histogram))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class StageTimer:
+    """
+    Đo thời gian từng bước của pipeline. Mỗi bước được cộng vào `timings` (giây)
+    và ghi vào histogram theo nhãn stage.
+    """
+
+    def __init__(self, histogram=None):
+        self.histogram = histogram
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            if self.histogram is not None:
+                self.histogram.observe(elapsed, stage=name)
@@ -0,0 +1,166 @@
+# utils/model_loader.py
+
+import logging
+import threading
+import time
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# eager: nạp ngay khi import app (dùng với gunicorn preload_app để worker chia sẻ trọng số)
+# background: import app trả về ngay, model được nạp trong thread nền
+# lazy: chỉ nạp khi request đầu tiên (hoặc /readyz) cần đến
+MODEL_LOAD_MODES = ('eager', 'background', 'lazy')
+
+
+class WhisperRuntime:
+    """
+    Processor, model, device và batcher của tiến trình, được nạp đúng một lần (an toàn giữa các thread).
+    `ready` chỉ đúng khi model đã nạp xong và (nếu bật) đã chạy warm-up trong tiến trình hiện tại.
+    """
+
+    def __init__(self, model_dir, backend=None, share_memory=False, batching_enabled=False,
+                 batch_max_size=8, batch_max_wait_ms=20, warm_up_enabled=False):
+        self.model_dir = model_dir
+        self.backend = backend
+        self.share_memory = share_memory
+        self.batching_enabled = batching_enabled
+        self.batch_max_size = batch_max_size
+        self.batch_max_wait_ms = batch_max_wait_ms
+        self.warm_up_enabled = warm_up_enabled
+
+        self.processor = None
+        self.model = None
+        self.device = None
+        self.batcher = None
+        self.error = None
+        self.load_seconds = None
+        self.warm_up_seconds = None
+
+        self._load_lock = threading.Lock()
+        self._warm_up_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._warmed_up = threading.Event()
+        self._thread = None
+
+    @property
+    def loaded(self):
+        return self._loaded.is_set()
+
+    @property
+    def ready(self):
+        return self._loaded.is_set() and (not self.warm_up_enabled or self._warmed_up.is_set())
+
+    def load(self):
+        """Nạp model nếu chưa nạp; các thread gọi đồng thời chờ cùng một lần nạp."""
+        if self._loaded.is_set():
+            return self
+        with self._load_lock:
+            if self._loaded.is_set():
+                return self
+
+            from pronunciation_assessment import load_whisper_model
+
+            logger.info("Loading Whisper model...")
+            start = time.perf_counter()
+            try:
+                processor, model, device = load_whisper_model(self.model_dir, self.backend)
+                if self.share_memory:
+                    # Đưa trọng số vào shared memory để các worker fork từ master dùng chung, không sao chép
+                    model.share_memory()
+            except Exception as e:
+                self.error = str(e)
+                logger.error(f"Error loading Whisper model: {e}")
+                raise
+
+            self.processor, self.model, self.device = processor, model, device
+            if self.batching_enabled:
+                self.batcher = self._create_batcher()
+            self.error = None
+            self.load_seconds = time.perf_counter() - start
+            self._loaded.set()
+            logger.info(f"Whisper model loaded successfully in {self.load_seconds:.2f}s.")
+        return self
+
+    def get(self):
+        """Runtime đã nạp model (nạp đồng bộ nếu cần) — dùng trong các endpoint."""
+        return self.load()
+
+    def warm_up(self):
+        """Chạy pipeline một lần trên âm thanh tổng hợp. Lỗi warm-up chỉ được ghi log, không chặn readiness."""
+        if self._warmed_up.is_set():
+            return
+        self.load()
+        with self._warm_up_lock:
+            if self._warmed_up.is_set():
+                return
+
+            from pronunciation_assessment import warm_up_pipeline
+
+            start = time.perf_counter()
+            try:
+                # Không đi qua batcher để warm-up không khởi động thread nền trong tiến trình master
+                timings = warm_up_pipeline(self.processor, self.model, self.device)
+                logger.info(f"Warm-up finished: {timings}")
+            except Exception as e:
+                logger.warning(f"Warm-up failed: {e}")
+            self.warm_up_seconds = time.perf_counter() - start
+            self._warmed_up.set()
+
+    def start_background(self):
+        """Nạp (và warm-up nếu bật) trong thread nền; không làm gì nếu đã sẵn sàng hoặc đang nạp."""
+        with self._thread_lock:
+            if self.ready or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._load_and_warm_up, name='whisper-loader', daemon=True)
+            self._thread.start()
+
+    def wait_until_ready(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.ready:
+            if self.error is not None and not (self._thread is not None and self._thread.is_alive()):
+                return False
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            event = self._warmed_up if self._loaded.is_set() else self._loaded
+            event.wait(0.1 if remaining is None else min(0.1, remaining))
+        return True
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'loaded': self.loaded,
+            'loading': self._thread is not None and self._thread.is_alive(),
+            'warmed_up': self._warmed_up.is_set(),
+            'load_seconds': self.load_seconds,
+            'warm_up_seconds': self.warm_up_seconds,
+            'error': self.error
+        }
+
+    def _load_and_warm_up(self):
+        try:
+            self.load()
+            if self.warm_up_enabled:
+                self.warm_up()
+        except Exception:
+            # Lỗi đã được ghi vào self.error; /readyz sẽ báo 503
+            pass
+
+    def _create_batcher(self):
+        from utils.batching import WhisperBatcher
+
+        # Thread nền của batcher được khởi động khi có request đầu tiên
+        batcher = WhisperBatcher(
+            self.processor,
+            self.model,
+            self.device,
+            max_batch_size=self.batch_max_size,
+            max_wait_ms=self.batch_max_wait_ms
+        )
+        REGISTRY.gauge('whisper_batcher_queue_depth', 'Feature batches waiting for the Whisper batcher.', function=batcher.queue_depth)
+        REGISTRY.histogram('whisper_batch_size', 'Samples per batched Whisper generate call.', histogram=batcher.batch_size_histogram)
+        REGISTRY.histogram('whisper_batch_queue_wait_seconds', 'Time requests wait for a Whisper batch.', histogram=batcher.queue_wait_histogram)
+        return batcher
@@ -0,0 +1,108 @@
+# utils/pitch.py
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PITCH_ENGINES = ('praat', 'yin')
+
+# Bước thời gian của đường F0 (giây)
+TIME_STEP = 0.01
+# Khoảng không hữu thanh tối thiểu để tách hai cụm (phrase) và độ dài tối thiểu của một cụm
+PHRASE_GAP_SECONDS = 0.3
+MIN_PHRASE_SECONDS = 0.2
+# Sample rate dùng cho YIN: đủ cho F0 của giọng nói (< 500 Hz) và rẻ hơn một nửa so với 16 kHz
+YIN_SAMPLING_RATE = 8000
+
+
+def _f0_praat(speech_array, sampling_rate, pitch_floor, pitch_ceiling):
+    import parselmouth
+
+    sound = parselmouth.Sound(speech_array.astype(np.float64), sampling_frequency=sampling_rate)
+    pitch = sound.to_pitch(time_step=TIME_STEP, pitch_floor=pitch_floor, pitch_ceiling=pitch_ceiling)
+    f0 = pitch.selected_array['frequency'].astype(np.float64)
+    f0[f0 <= 0] = np.nan
+    return pitch.xs(), f0
+
+
+def _f0_yin(speech_array, sampling_rate, pitch_floor, pitch_ceiling, top_db=30):
+    import librosa
+
+    y = librosa.resample(speech_array, orig_sr=sampling_rate, target_sr=YIN_SAMPLING_RATE)
+    hop_length = int(TIME_STEP * YIN_SAMPLING_RATE)
+    # Khung phải chứa ít nhất hai chu kỳ của F0 thấp nhất
+    frame_length = int(2 ** np.ceil(np.log2(2.5 * YIN_SAMPLING_RATE / pitch_floor)))
+    f0 = librosa.yin(y, fmin=pitch_floor, fmax=pitch_ceiling, sr=YIN_SAMPLING_RATE,
+                     frame_length=frame_length, hop_length=hop_length)
+
+    # YIN luôn trả về một giá trị, nên coi các khung có năng lượng thấp là không hữu thanh
+    rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0][:len(f0)]
+    voiced = librosa.amplitude_to_db(rms, ref=np.max) > -top_db
+    f0 = np.where(voiced, f0, np.nan)
+    times = librosa.frames_to_time(np.arange(len(f0)), sr=YIN_SAMPLING_RATE, hop_length=hop_length)
+    return times, f0
+
+
+def extract_f0(speech_array, sampling_rate, engine='praat', pitch_floor=75.0, pitch_ceiling=500.0):
+    """
+    Trích xuất đường F0 từ buffer đã giải mã. Trả về (times, f0), f0 là NaN ở khung không hữu thanh.
+    Chi phí tuyến tính theo độ dài âm thanh với cả hai engine.
+    """
+    if engine not in PITCH_ENGINES:
+        raise ValueError(f"Unknown pitch engine: {engine}. Allowed engines: {PITCH_ENGINES}")
+    if engine == 'praat':
+        try:
+            return _f0_praat(speech_array, sampling_rate, pitch_floor, pitch_ceiling)
+        except ImportError:
+            logger.warning("praat-parselmouth is not installed, falling back to YIN.")
+    return _f0_yin(speech_array, sampling_rate, pitch_floor, pitch_ceiling)
+
+
+def _phrases(times, f0):
+    """Chia các khung hữu thanh thành cụm, ngắt khi khoảng không hữu thanh dài hơn PHRASE_GAP_SECONDS."""
+    voiced = np.flatnonzero(~np.isnan(f0))
+    if len(voiced) == 0:
+        return []
+    gap_frames = max(1, int(round(PHRASE_GAP_SECONDS / TIME_STEP)))
+    breaks = np.flatnonzero(np.diff(voiced) > gap_frames)
+    return np.split(voiced, breaks + 1)
+
+
+def summarize_f0_contour(times, f0):
+    """
+    Tóm tắt đường F0: trung bình, khoảng (phân vị 5-95 để bỏ lỗi quãng tám), độ lệch chuẩn,
+    tỉ lệ khung hữu thanh và độ dốc (Hz/giây) của từng cụm.
+    """
+    voiced_f0 = f0[~np.isnan(f0)]
+    if len(voiced_f0) == 0:
+        return {
+            'MeanF0': 0.0, 'MinF0': 0.0, 'MaxF0': 0.0, 'RangeF0': 0.0, 'RangeSemitones': 0.0,
+            'StdF0': 0.0, 'VoicedRatio': 0.0, 'Phrases': []
+        }
+
+    low, high = np.percentile(voiced_f0, [5, 95])
+    phrases = []
+    for indexes in _phrases(times, f0):
+        start, end = float(times[indexes[0]]), float(times[indexes[-1]])
+        if end - start < MIN_PHRASE_SECONDS:
+            continue
+        slope = np.polyfit(times[indexes], f0[indexes], 1)[0]
+        phrases.append({
+            'Start': start,
+            'End': end,
+            'MeanF0': float(np.mean(f0[indexes])),
+            'Slope': float(slope)
+        })
+
+    return {
+        'MeanF0': float(np.mean(voiced_f0)),
+        'MinF0': float(low),
+        'MaxF0': float(high),
+        'RangeF0': float(high - low),
+        'RangeSemitones': float(12 * np.log2(high / low)) if low > 0 else 0.0,
+        'StdF0': float(np.std(voiced_f0)),
+        'VoicedRatio': float(len(voiced_f0) / len(f0)),
+        'Phrases': phrases
+    }
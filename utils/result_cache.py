@@ -0,0 +1,157 @@
+# utils/result_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream):
+    """SHA-256 của toàn bộ nội dung stream, sau đó đưa con trỏ về đầu để có thể đọc lại."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(_HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+# Các cấu hình làm thay đổi kết quả chấm; đổi một trong số này cũng làm các kết quả đã cache không còn khớp
+SCORING_CONFIG_KEYS = (
+    'VAD_ENABLED', 'VAD_TOP_DB', 'VAD_FLOOR_DB', 'VAD_MIN_SPEECH_SECONDS', 'VAD_PADDING_SECONDS',
+    'PITCH_ENGINE', 'PITCH_FLOOR', 'PITCH_CEILING',
+    'GRAMMAR_BACKEND', 'GRAMMAR_VOCABULARY_FILE', 'GRAMMAR_USE_GPU', 'GRAMFORMER_NUM_BEAMS',
+    'LONG_AUDIO_CHUNKING', 'LONG_AUDIO_MAX_CHUNK_SECONDS', 'LONG_AUDIO_OVERLAP_SECONDS',
+    'WHISPER_ONNX_DIR'
+)
+
+
+def scoring_config(config):
+    """Giá trị của SCORING_CONFIG_KEYS trong `config` (dict như app.config)."""
+    return {name: config.get(name) for name in SCORING_CONFIG_KEYS}
+
+
+def model_version(model_dir, backend, scoring=None):
+    """
+    Định danh phiên bản model: đường dẫn MODEL_DIR, backend, thời điểm sửa đổi các tệp trong đó
+    và cấu hình chấm điểm (`scoring`, xem scoring_config). Đổi model, cập nhật trọng số hoặc đổi cấu hình
+    chấm sẽ cho phiên bản khác, nên các kết quả cũ không còn khớp (và bị purge_stale xóa khỏi DB).
+    """
+    digest = hashlib.sha256()
+    digest.update(os.path.abspath(model_dir).encode('utf-8'))
+    digest.update(backend.encode('utf-8'))
+    if scoring:
+        digest.update(json.dumps(scoring, sort_keys=True, default=str).encode('utf-8'))
+    if os.path.isdir(model_dir):
+        for name in sorted(os.listdir(model_dir)):
+            path = os.path.join(model_dir, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def result_cache_key(audio_digest, reference_text, language, version):
+    # Nhiều reference: khóa gồm toàn bộ danh sách theo đúng thứ tự (BestReferenceIndex phụ thuộc thứ tự)
+    if not isinstance(reference_text, str):
+        reference_text = json.dumps(list(reference_text), ensure_ascii=False)
+    digest = hashlib.sha256()
+    for part in (audio_digest, reference_text, language, version):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache kết quả đánh giá theo nội dung (hash âm thanh + reference_text + ngôn ngữ + phiên bản model).
+
+    Tầng 1: bộ nhớ trong tiến trình, giới hạn số mục và TTL.
+    Tầng 2 (tùy chọn): bảng SQLite qua SQLAlchemy, dùng chung giữa các worker. Cần app context.
+    """
+
+    def __init__(self, version, max_entries=1024, ttl_seconds=3600, use_db=False):
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.use_db = use_db
+        self._memory = LRUCache(max_size=max_entries)
+
+    def key(self, audio_digest, reference_text, language):
+        return result_cache_key(audio_digest, reference_text, language, self.version)
+
+    def get(self, key):
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > time.monotonic():
+                return result
+            # Hết hạn: bỏ ngay thay vì giữ đến khi bị LRU đẩy ra
+            self._memory.pop(key)
+
+        if self.use_db:
+            result = self._db_get(key)
+            if result is not None:
+                self._memory.put(key, (time.monotonic() + self.ttl_seconds, result))
+                return result
+        return None
+
+    def put(self, key, result):
+        self._memory.put(key, (time.monotonic() + self.ttl_seconds, result))
+        if self.use_db:
+            self._db_put(key, result)
+
+    def _db_get(self, key):
+        from models.result_cache import CachedResult
+
+        row = CachedResult.query.filter_by(key=key, model_version=self.version).first()
+        if row is None:
+            return None
+        if row.created_at < datetime.utcnow() - timedelta(seconds=self.ttl_seconds):
+            return None
+        return json.loads(row.result)
+
+    def _db_put(self, key, result):
+        from models.api_key import db
+        from models.result_cache import CachedResult
+
+        try:
+            db.session.merge(CachedResult(
+                key=key,
+                model_version=self.version,
+                result=json.dumps(result),
+                created_at=datetime.utcnow()
+            ))
+            db.session.commit()
+        except Exception as e:
+            # Cache không được làm hỏng request (ví dụ hai worker ghi cùng khóa)
+            logger.warning(f"Could not store result in cache: {e}")
+            db.session.rollback()
+
+    def purge_stale(self):
+        """Xóa các mục của phiên bản model khác hoặc đã hết TTL trong tầng SQLite."""
+        if not self.use_db:
+            return 0
+        from models.api_key import db
+        from models.result_cache import CachedResult
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        count = CachedResult.query.filter(
+            (CachedResult.model_version != self.version) | (CachedResult.created_at < cutoff)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if count:
+            logger.info(f"Purged {count} stale cached results.")
+        return count
+
+    def stats(self):
+        stats = self._memory.stats()
+        stats.update({'model_version': self.version, 'ttl_seconds': self.ttl_seconds, 'db_tier': self.use_db})
+        return stats
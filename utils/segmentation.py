@@ -0,0 +1,77 @@
+# utils/segmentation.py
+
+import bisect
+
+# Whisper feature extractor chỉ nhận tối đa 30 giây âm thanh cho mỗi mẫu
+WHISPER_MAX_SECONDS = 30.0
+
+
+def silence_cut_points(speech_array, top_db=35):
+    """Trả về vị trí (mẫu) ở giữa các khoảng lặng giữa những đoạn có năng lượng."""
+    import librosa
+
+    intervals = librosa.effects.split(speech_array, top_db=top_db)
+    return [
+        int((previous_end + next_start) // 2)
+        for (_, previous_end), (next_start, _) in zip(intervals[:-1], intervals[1:])
+    ]
+
+
+def split_into_chunks(speech_array, sampling_rate, max_chunk_seconds=28.0, overlap_seconds=1.0,
+                      min_chunk_seconds=5.0, top_db=35):
+    """
+    Chia âm thanh dài thành các đoạn không vượt quá `max_chunk_seconds`.
+
+    Ưu tiên cắt tại khoảng lặng (theo năng lượng). Nếu không có khoảng lặng phù hợp thì
+    cắt cứng và cho đoạn sau chồng lên đoạn trước `overlap_seconds` để không mất từ ở ranh giới.
+    Trả về danh sách (start, end, overlaps_previous) tính theo chỉ số mẫu.
+    """
+    total = len(speech_array)
+    max_len = int(max_chunk_seconds * sampling_rate)
+    if total <= max_len:
+        return [(0, total, False)]
+
+    min_len = int(min_chunk_seconds * sampling_rate)
+    overlap = min(int(overlap_seconds * sampling_rate), max_len // 2)
+    cut_points = silence_cut_points(speech_array, top_db=top_db)
+
+    chunks = []
+    start = 0
+    overlaps_previous = False
+    while total - start > max_len:
+        limit = start + max_len
+        # Điểm cắt tại khoảng lặng cuối cùng nằm trong (start + min_len, limit]
+        index = bisect.bisect_right(cut_points, limit) - 1
+        if index >= 0 and cut_points[index] > start + min_len:
+            end = cut_points[index]
+            next_start = end
+            next_overlaps = False
+        else:
+            end = limit
+            next_start = limit - overlap
+            next_overlaps = overlap > 0
+        chunks.append((start, end, overlaps_previous))
+        start = next_start
+        overlaps_previous = next_overlaps
+
+    chunks.append((start, total, overlaps_previous))
+    return chunks
+
+
+def merge_transcripts(texts, overlaps, max_overlap_words=8):
+    """
+    Ghép transcription của các đoạn liên tiếp. Với đoạn chồng lấn, bỏ các từ ở đầu đoạn sau
+    trùng với các từ ở cuối phần đã ghép.
+    """
+    merged = []
+    for text, overlaps_previous in zip(texts, overlaps):
+        words = text.split()
+        if overlaps_previous and merged:
+            tail = [w.lower().strip('.,!?;:') for w in merged[-max_overlap_words:]]
+            head = [w.lower().strip('.,!?;:') for w in words[:max_overlap_words]]
+            for k in range(min(len(tail), len(head)), 0, -1):
+                if tail[-k:] == head[:k]:
+                    words = words[k:]
+                    break
+        merged.extend(words)
+    return ' '.join(merged)
@@ -0,0 +1,188 @@
+# utils/streaming.py
+
+import json
+import logging
+from contextlib import nullcontext
+
+import numpy as np
+
+from pronunciation_assessment import (
+    SAMPLING_RATE, calculate_per, get_reference_entry, preprocess_text,
+    pronunciation_assessment_configured_with_whisper, text_to_phonemes, transcribe_features
+)
+from utils.alignment import edit_distance
+from utils.segmentation import silence_cut_points
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_SAMPLE = 2  # PCM 16-bit
+# Tần số lấy mẫu client được phép gửi
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+
+class StreamLimitExceeded(Exception):
+    pass
+
+
+def parse_stream_options(message):
+    """
+    Kiểm tra tin nhắn đầu tiên của phiên WebSocket. Trả về (reference_text, language, sample_rate);
+    ValueError với thông báo cho client nếu không hợp lệ.
+    """
+    try:
+        options = json.loads(message)
+    except (TypeError, ValueError):
+        raise ValueError('First message must be JSON with reference_text')
+    if not isinstance(options, dict):
+        raise ValueError('First message must be JSON with reference_text')
+
+    reference_text = options.get('reference_text')
+    if not isinstance(reference_text, str) or not reference_text.strip():
+        raise ValueError('reference_text must be a non-empty string')
+    language = options.get('language', 'en-US')
+    if not isinstance(language, str):
+        raise ValueError('language must be a string')
+    sample_rate = options.get('sample_rate', SAMPLING_RATE)
+    if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float)) \
+            or not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f'sample_rate must be a number between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}')
+    return reference_text, language, int(sample_rate)
+
+
+def parse_control_message(message):
+    """Tin nhắn văn bản sau tin nhắn đầu tiên: trả về tên sự kiện; ValueError nếu không phải JSON object."""
+    try:
+        options = json.loads(message)
+    except (TypeError, ValueError):
+        options = None
+    if not isinstance(options, dict) or not isinstance(options.get('event'), str):
+        raise ValueError('Text messages must be JSON like {"event": "end"}')
+    return options['event']
+
+
+class StreamingSession:
+    """
+    Phiên đánh giá phát âm theo thời gian thực cho một kết nối WebSocket.
+
+    Âm thanh PCM 16-bit mono được giữ nguyên dạng trong một buffer giới hạn `max_seconds`.
+    Kết quả tạm thời được tính trên cửa sổ trượt: phần đã "chốt" được chép lời một lần,
+    chỉ phần chưa chốt (tối đa `window_seconds`) được chép lời lại mỗi lần có thêm âm thanh.
+    Kết quả cuối cùng chạy đúng pipeline của REST endpoint trên toàn bộ buffer.
+
+    `admission(wait)` trả về context manager giữ một slot suy luận (AdmissionController.admit):
+    kết quả tạm thời không chờ slot (wait=False), kết quả cuối cùng chờ như REST endpoint.
+    """
+
+    def __init__(self, reference_text, language, processor, model, device, batcher=None, sample_rate=SAMPLING_RATE,
+                 max_seconds=120.0, window_seconds=28.0, partial_interval_seconds=2.0, admission=None):
+        self.reference_text = reference_text
+        self.language = language
+        self.processor = processor
+        self.model = model
+        self.device = device
+        self.batcher = batcher
+        self.sample_rate = int(sample_rate)
+        self.admission = admission or (lambda wait=True: nullcontext())
+
+        self.max_bytes = int(max_seconds * self.sample_rate) * BYTES_PER_SAMPLE
+        self.window_samples = int(window_seconds * self.sample_rate)
+        self.partial_interval_samples = int(partial_interval_seconds * self.sample_rate)
+
+        self._pcm = bytearray()
+        self._committed_samples = 0
+        self._committed_text = ''
+        self._last_partial_samples = 0
+        self.reference_entry = get_reference_entry(reference_text)
+
+    @property
+    def total_samples(self):
+        return len(self._pcm) // BYTES_PER_SAMPLE
+
+    @property
+    def duration(self):
+        return self.total_samples / self.sample_rate
+
+    def add_audio(self, data):
+        """Thêm một khối PCM. Trả về kết quả tạm thời nếu đã đủ âm thanh mới, ngược lại None."""
+        if len(self._pcm) + len(data) > self.max_bytes:
+            raise StreamLimitExceeded(f"Stream exceeds the maximum of {self.max_bytes // BYTES_PER_SAMPLE // self.sample_rate} seconds")
+        self._pcm.extend(data)
+
+        if self.total_samples - self._last_partial_samples < self.partial_interval_samples:
+            return None
+        self._last_partial_samples = self.total_samples
+        # Nếu bị từ chối (AdmissionRejected), âm thanh vẫn được giữ và lần tạm thời sau sẽ thử lại
+        with self.admission(wait=False):
+            return self.partial_result()
+
+    def _to_float(self, start, end):
+        """Đổi đoạn PCM [start, end) (theo mẫu) sang float32 16 kHz giống librosa.load."""
+        samples = np.frombuffer(bytes(self._pcm[start * BYTES_PER_SAMPLE:end * BYTES_PER_SAMPLE]), dtype='<i2')
+        speech_array = samples.astype(np.float32) / 32768.0
+        if self.sample_rate != SAMPLING_RATE:
+            import librosa
+
+            speech_array = librosa.resample(speech_array, orig_sr=self.sample_rate, target_sr=SAMPLING_RATE)
+        return speech_array
+
+    def _transcribe(self, start, end):
+        speech_array = self._to_float(start, end)
+        input_features = self.processor(speech_array, sampling_rate=SAMPLING_RATE, return_tensors="pt").input_features
+        return transcribe_features(input_features, self.processor, self.model, self.device, batcher=self.batcher)[0]
+
+    def _commit_if_needed(self):
+        # Khi phần chưa chốt dài hơn cửa sổ, chốt đến khoảng lặng cuối cùng trong cửa sổ (hoặc cắt cứng)
+        while self.total_samples - self._committed_samples > self.window_samples:
+            start = self._committed_samples
+            window = self._to_float(start, start + self.window_samples)
+            # Chỉ dùng khoảng lặng ở nửa sau cửa sổ để mỗi lần chốt tiến đủ xa
+            cut_points = [c for c in silence_cut_points(window) if c >= len(window) // 2]
+            scale = self.sample_rate / SAMPLING_RATE
+            end = start + (int(cut_points[-1] * scale) if cut_points else self.window_samples)
+            text = self._transcribe(start, end)
+            self._committed_text = ' '.join(t for t in (self._committed_text, text.strip()) if t)
+            self._committed_samples = end
+
+    def partial_result(self):
+        self._commit_if_needed()
+        tail_text = ''
+        if self.total_samples > self._committed_samples:
+            tail_text = self._transcribe(self._committed_samples, self.total_samples).strip()
+        transcription = preprocess_text(' '.join(t for t in (self._committed_text, tail_text) if t))
+
+        # So với phần đầu của reference_text có cùng số từ với transcription hiện tại
+        hypothesis_words = transcription.split()
+        reference = self.reference_entry
+        word_count = min(len(hypothesis_words), len(reference.words))
+        reference_words = reference.words[:word_count]
+        reference_phonemes = [p for p, w in zip(reference.phonemes, reference.phoneme_word_index) if w < word_count]
+        transcription_phonemes = text_to_phonemes(transcription) if transcription else []
+
+        word_errors = edit_distance(list(reference_words), hypothesis_words)
+        running_wer = word_errors / len(reference_words) * 100 if reference_words else 0.0
+
+        return {
+            'event': 'partial',
+            'duration': self.duration,
+            'transcription': transcription,
+            'WER': float(running_wer),
+            'AccuracyScore': float(calculate_per(transcription_phonemes, reference_phonemes)),
+            'ReferenceProgress': word_count / len(reference.words) if reference.words else 0.0
+        }
+
+    def final_result(self):
+        """Chạy pipeline của REST endpoint trên toàn bộ âm thanh đã nhận."""
+        speech_array = self._to_float(0, self.total_samples)
+        with self.admission(wait=True):
+            results = pronunciation_assessment_configured_with_whisper(
+                filename='<stream>',
+                language=self.language,
+                reference_text=self.reference_text,
+                processor=self.processor,
+                model=self.model,
+                device=self.device,
+                batcher=self.batcher,
+                speech_array=speech_array
+            )
+        return {'event': 'final', 'result': results}
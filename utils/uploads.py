@@ -0,0 +1,76 @@
+# utils/uploads.py
+
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import soundfile as sf
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MODES = ('disk', 'stream', 'spooled')
+
+# Định dạng mà libsndfile đọc được trực tiếp từ buffer trong bộ nhớ
+_IN_MEMORY_FORMATS = {fmt.lower() for fmt in sf.available_formats()}
+
+
+def _extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def can_decode_in_memory(filename):
+    """Kiểm tra định dạng có giải mã được từ buffer mà không cần đường dẫn tệp (m4a thì không)."""
+    return _extension(filename) in _IN_MEMORY_FORMATS
+
+
+def unique_upload_path(upload_folder, filename):
+    """Tạo đường dẫn duy nhất để hai upload cùng tên không ghi đè lên nhau."""
+    return os.path.join(upload_folder, f"{uuid.uuid4().hex}_{secure_filename(filename)}")
+
+
+@contextmanager
+def _temporary_copy(stream, filename, upload_folder):
+    path = unique_upload_path(upload_folder, filename)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(stream, f)
+    logger.info(f"Tệp đã được lưu: {path}")
+    try:
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+            logger.info(f"Tệp đã bị xóa: {path}")
+
+
+@contextmanager
+def upload_source(file, mode='spooled', upload_folder='uploads', spool_max_size=10 * 1024 * 1024):
+    """
+    Trả về nguồn âm thanh (đường dẫn hoặc đối tượng file) cho một FileStorage đã upload.
+
+    - disk:    lưu vào UPLOAD_FOLDER với tên duy nhất rồi xóa sau khi xử lý
+    - stream:  giải mã trực tiếp từ stream của request
+    - spooled: sao chép vào buffer trong bộ nhớ, chỉ tràn ra tệp tạm khi vượt `spool_max_size`
+
+    Các định dạng không đọc được từ bộ nhớ (ví dụ m4a) luôn được ghi ra tệp tạm có tên duy nhất.
+    """
+    if mode not in UPLOAD_MODES:
+        raise ValueError(f"Unknown upload mode: {mode}. Allowed modes: {UPLOAD_MODES}")
+
+    if mode == 'disk' or not can_decode_in_memory(file.filename):
+        with _temporary_copy(file.stream, file.filename, upload_folder) as path:
+            yield path
+        return
+
+    if mode == 'stream':
+        file.stream.seek(0)
+        yield file.stream
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=spool_max_size) as spool:
+        shutil.copyfileobj(file.stream, spool)
+        spool.seek(0)
+        yield spool
@@ -0,0 +1,45 @@
+# utils/vad.py
+
+from collections import namedtuple
+
+import numpy as np
+
+# Vùng có tiếng nói trong buffer (theo mẫu, [start, end)) và tổng thời lượng các khung hữu thanh
+SpeechRegion = namedtuple('SpeechRegion', ['start', 'end', 'voiced_seconds'])
+
+
+def frame_rms_db(speech_array, frame_length, hop_length):
+    """Năng lượng RMS (dBFS) của từng khung, tính từ tổng tích lũy của bình phương (O(n), không tạo ma trận khung)."""
+    if len(speech_array) < frame_length:
+        speech_array = np.pad(speech_array, (0, frame_length - len(speech_array)))
+    cumulative = np.concatenate(([0.0], np.cumsum(np.square(speech_array, dtype=np.float64))))
+    starts = np.arange(0, len(speech_array) - frame_length + 1, hop_length)
+    mean_square = (cumulative[starts + frame_length] - cumulative[starts]) / frame_length
+    return 10 * np.log10(np.maximum(mean_square, 1e-20))
+
+
+def detect_speech(speech_array, sampling_rate, top_db=35.0, floor_db=-50.0, min_speech_seconds=0.15,
+                  padding_seconds=0.2, frame_seconds=0.025, hop_seconds=0.010):
+    """
+    Tìm vùng từ khung có tiếng nói đầu tiên đến khung cuối cùng. Một khung được coi là có tiếng nói
+    khi năng lượng cao hơn cả `floor_db` (ngưỡng tuyệt đối, loại nhiễu nền của bản ghi im lặng)
+    và mức to nhất của bản ghi trừ `top_db` (ngưỡng tương đối, không phụ thuộc độ lớn của micro).
+    Vùng được nới thêm `padding_seconds` mỗi phía để không cắt mất phụ âm đầu/cuối.
+    Trả về None nếu tổng thời lượng hữu thanh ngắn hơn `min_speech_seconds` (không có tiếng nói).
+    """
+    frame_length = max(1, int(frame_seconds * sampling_rate))
+    hop_length = max(1, int(hop_seconds * sampling_rate))
+    if len(speech_array) == 0:
+        return None
+
+    energy_db = frame_rms_db(speech_array, frame_length, hop_length)
+    threshold = max(floor_db, float(energy_db.max()) - top_db)
+    voiced = np.flatnonzero(energy_db > threshold)
+    voiced_seconds = len(voiced) * hop_length / sampling_rate
+    if len(voiced) == 0 or voiced_seconds < min_speech_seconds:
+        return None
+
+    padding = int(padding_seconds * sampling_rate)
+    start = max(0, int(voiced[0]) * hop_length - padding)
+    end = min(len(speech_array), int(voiced[-1]) * hop_length + frame_length + padding)
+    return SpeechRegion(start, end, voiced_seconds)
@@ -0,0 +1,106 @@
+# utils/whisper_backends.py
+
+import logging
+import os
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+
+class WhisperBackend:
+    """
+    Giao diện chung cho các backend suy luận Whisper. Pipeline chỉ dùng generate(input_features),
+    nên backend có thể thay thế trực tiếp cho WhisperForConditionalGeneration.
+    """
+
+    name = None
+
+    def __init__(self, model_dir, device):
+        self.model_dir = model_dir
+        self.device = device
+
+    def generate(self, input_features):
+        raise NotImplementedError
+
+    def share_memory(self):
+        """Đưa trọng số vào shared memory (nếu backend hỗ trợ) để dùng chung giữa các worker fork."""
+        pass
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} {self.model_dir} on {self.device}>'
+
+
+class TorchWhisperBackend(WhisperBackend):
+    """PyTorch FP32 (mặc định), chạy trên GPU nếu có."""
+
+    name = 'torch'
+
+    def __init__(self, model_dir, device=None):
+        from transformers import WhisperForConditionalGeneration
+
+        device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        super().__init__(model_dir, device)
+        self.model = WhisperForConditionalGeneration.from_pretrained(model_dir)
+        self.model.to(device)
+        self.model.eval()
+
+    def generate(self, input_features):
+        with torch.no_grad():
+            return self.model.generate(input_features.to(self.device))
+
+    def share_memory(self):
+        if self.device.type == 'cpu':
+            self.model.share_memory()
+
+
+class QuantizedTorchWhisperBackend(TorchWhisperBackend):
+    """PyTorch với lượng tử hóa động INT8 cho các lớp Linear (chỉ chạy trên CPU)."""
+
+    name = 'torch-int8'
+
+    def __init__(self, model_dir, device=None):
+        super().__init__(model_dir, torch.device('cpu'))
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model.eval()
+
+
+class OnnxWhisperBackend(WhisperBackend):
+    """
+    ONNX Runtime (CPU) thông qua optimum. Lần đầu sẽ export model sang ONNX và lưu vào `onnx_dir`
+    để các lần khởi động sau nạp trực tiếp.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_dir, device=None, onnx_dir=None):
+        try:
+            from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        except ImportError as e:
+            raise ImportError("The 'onnx' Whisper backend requires optimum[onnxruntime] to be installed.") from e
+
+        super().__init__(model_dir, torch.device('cpu'))
+        onnx_dir = onnx_dir or os.path.join(model_dir, 'onnx')
+        if os.path.isdir(onnx_dir) and any(name.endswith('.onnx') for name in os.listdir(onnx_dir)):
+            self.model = ORTModelForSpeechSeq2Seq.from_pretrained(onnx_dir)
+        else:
+            logger.info(f"Exporting Whisper model to ONNX: {onnx_dir}")
+            self.model = ORTModelForSpeechSeq2Seq.from_pretrained(model_dir, export=True)
+            self.model.save_pretrained(onnx_dir)
+        self.onnx_dir = onnx_dir
+
+    def generate(self, input_features):
+        return self.model.generate(input_features.to(self.device))
+
+
+WHISPER_BACKENDS = {
+    TorchWhisperBackend.name: TorchWhisperBackend,
+    QuantizedTorchWhisperBackend.name: QuantizedTorchWhisperBackend,
+    OnnxWhisperBackend.name: OnnxWhisperBackend
+}
+
+
+def create_whisper_backend(name, model_dir, **kwargs):
+    if name not in WHISPER_BACKENDS:
+        raise ValueError(f"Unknown Whisper backend: {name}. Available: {sorted(WHISPER_BACKENDS)}")
+    return WHISPER_BACKENDS[name](model_dir, **kwargs)
@@ -0,0 +1,8 @@
+# wsgi.py
+# Entry point cho môi trường production:
+#     gunicorn -c gunicorn.conf.py wsgi:app
+
+from app import app
+
+if __name__ == '__main__':
+    app.run()